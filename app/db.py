@@ -1,10 +1,13 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
 from app.config import Config
 
 class Base(DeclarativeBase):
     pass
 
+class BotSession(Session):
+    """Sync-сессия фабрики бота: на неё навешены хуки кэша слотов из app.logic."""
+
 def make_engine(cfg: Config):
     url = cfg.database_url
     # Railway often provides a sync URL (postgresql:// or postgres://).
@@ -16,4 +19,6 @@ def make_engine(cfg: Config):
     return create_async_engine(url, pool_pre_ping=True)
 
 def make_session_factory(engine):
-    return async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    return async_sessionmaker(
+        engine, expire_on_commit=False, class_=AsyncSession, sync_session_class=BotSession,
+    )
@@ -1,12 +1,12 @@
 from __future__ import annotations
-from datetime import datetime, date, timedelta, time
+from datetime import datetime, date, timedelta, time, timezone
 from decimal import Decimal
 from io import BytesIO
 from urllib.parse import quote
 import asyncio
 import logging
 import os
-import pytz
+import time as _time
 
 from PIL import Image, ImageDraw, ImageFont
 from telegram import Update
@@ -15,7 +15,8 @@ from telegram.ext import ContextTypes
 from app.config import Config
 from app.logic import (
     get_settings, upsert_user, set_user_phone, list_active_services, list_available_dates,
-    list_available_slots_for_service, list_available_slots_for_duration,
+    list_available_slots_for_duration,
+    list_available_slots_for_horizon,
     create_hold_appointment, create_hold_appointment_with_duration, get_user_appointments,
     get_user_appointments_history, get_appointment, admin_confirm, admin_reject,
     cancel_by_client, request_reschedule, confirm_reschedule, reject_reschedule,
@@ -25,7 +26,7 @@ from app.logic import (
     admin_cancel_appointment, list_available_break_slots, create_blocked_interval,
     admin_reschedule_appointment, admin_list_appointments_range,
     list_future_breaks, delete_blocked_interval, SettingsView,
-    create_break_rule, generate_breaks_from_rules
+    create_break_rule, generate_breaks_from_rules, day_bounds_utc, slots_generation,
 )
 from app.keyboards import (
     main_menu_kb, phone_request_kb, services_multi_kb, dates_kb, slots_kb, confirm_request_kb,
@@ -38,7 +39,7 @@ from app.keyboards import (
 )
 from app.models import AppointmentStatus, BlockedInterval
 from app.schedule_style import DAY_TIMELINE_STYLE, WEEK_SCHEDULE_STYLE
-from app.utils import format_price, appointment_services_label
+from app.utils import format_price, appointment_services_label, services_label_for, client_label_for
 from texts import (
     CONTACTS,
     PRECARE_RECOMMENDATIONS,
@@ -79,6 +80,12 @@ K_BREAK_TIME_ERRORS = "break_time_errors"
 K_BREAK_REASON = "break_reason"
 K_BREAK_REPEAT = "break_repeat"
 K_BREAK_CANCEL_IDS = "break_cancel_ids"
+K_SLOTS_CACHE = "slots_horizon"
+
+# Слоты всего горизонта считаются при показе дат и живут в user_data недолго:
+# выбор даты (и возврат к датам) обходится без запроса. Итоговую проверку всё
+# равно делает _ensure_slot_available при создании записи.
+SLOTS_CACHE_TTL_S = 60.0
 
 ADDRESS_LINE = "Мусы Джалиля 30 к1, квартира 123"
 
@@ -107,8 +114,8 @@ async def _load_break_cancel_items(
         end_local = now_local + timedelta(days=30)
         blocks = await list_future_breaks(
             s,
-            now_local.astimezone(pytz.UTC),
-            end_local.astimezone(pytz.UTC),
+            now_local.astimezone(timezone.utc),
+            end_local.astimezone(timezone.utc),
         )
     items = [
         (b.id, b.start_dt.astimezone(settings.tz), b.end_dt.astimezone(settings.tz))
@@ -121,6 +128,39 @@ def _slot_duration_for_services(services: list, base_service) -> int:
     buffer_sum = sum(int(s.buffer_min) for s in services)
     return duration_sum + buffer_sum - int(base_service.buffer_min)
 
+def _client_slot_duration(context: ContextTypes.DEFAULT_TYPE, services: list, service) -> int:
+    selected_services = _collect_selected_services(services, _selected_service_ids(context))
+    if len(selected_services) > 1:
+        return _slot_duration_for_services(selected_services, service)
+    return int(service.duration_min)
+
+def _cached_day_slots(
+    context: ContextTypes.DEFAULT_TYPE,
+    service_id: int,
+    duration_min: int,
+    day: date,
+    settings: SettingsView,
+) -> list[datetime] | None:
+    cached = context.user_data.get(K_SLOTS_CACHE)
+    if not cached:
+        return None
+    key, generation, expires_at, by_day = cached
+    # после любого commit, задевшего слоты (в т.ч. в другом инстансе — NOTIFY),
+    # поколение меняется и закэшированный горизонт больше не отдаём
+    if (
+        key != (service_id, duration_min)
+        or generation != slots_generation()
+        or expires_at <= _time.monotonic()
+    ):
+        return None
+    slots = by_day.get(day)
+    if slots is None:
+        return None
+    # за время жизни кэша часть слотов могла оказаться ближе min_lead_time —
+    # досрезаем так же, как _free_slot_starts делает со своим кэшем
+    earliest = datetime.now(tz=settings.tz) + timedelta(minutes=settings.min_lead_time_min)
+    return [st for st in slots if st >= earliest]
+
 def _display_duration_for_services(services: list) -> int:
     duration_sum = sum(int(s.duration_min) for s in services)
     buffer_sum = sum(int(s.buffer_min) for s in services)
@@ -221,7 +261,7 @@ def _normalize_phone(value: str) -> str:
     return phone
 
 def _generate_offline_tg_id() -> int:
-    return -int(datetime.now(tz=pytz.UTC).timestamp() * 1_000_000)
+    return -int(datetime.now(tz=timezone.utc).timestamp() * 1_000_000)
 
 def _increment_admin_time_errors(context: ContextTypes.DEFAULT_TYPE) -> int:
     errors = int(context.user_data.get(K_ADMIN_TIME_ERRORS, 0)) + 1
@@ -721,11 +761,28 @@ async def flow_services_from_callback(update: Update, context: ContextTypes.DEFA
 async def flow_dates(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session_factory = context.bot_data["session_factory"]
     cfg: Config = context.bot_data["cfg"]
+    svc_id = context.user_data.get(K_SVC)
     async with session_factory() as s:
         async with s.begin():
             settings = await get_settings(s, cfg.timezone)
             await _sync_break_rules(s, settings)
-            dates = await list_available_dates(s, settings)
+            services = await list_active_services(s)
+            service = next((x for x in services if x.id == svc_id), None)
+            if service is None:
+                context.user_data.pop(K_SLOTS_CACHE, None)
+                dates = await list_available_dates(s, settings)
+            else:
+                duration_min = _client_slot_duration(context, services, service)
+                # поколение берём до запроса: commit во время него сразу делает запись устаревшей
+                generation = slots_generation()
+                by_day = await list_available_slots_for_horizon(s, settings, service, duration_min)
+                context.user_data[K_SLOTS_CACHE] = (
+                    (service.id, duration_min),
+                    generation,
+                    _time.monotonic() + SLOTS_CACHE_TTL_S,
+                    by_day,
+                )
+                dates = list(by_day)
     await update.callback_query.message.edit_text("Выбери дату:", reply_markup=dates_kb(dates))
 
 async def admin_flow_dates(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -848,12 +905,10 @@ async def flow_slots(update: Update, context: ContextTypes.DEFAULT_TYPE):
             service = next((x for x in services if x.id == svc_id), None)
             if not service:
                 return await update.callback_query.message.edit_text("Услуга недоступна.")
-            selected_services = _collect_selected_services(services, _selected_service_ids(context))
-            if len(selected_services) > 1:
-                duration_min = _slot_duration_for_services(selected_services, service)
+            duration_min = _client_slot_duration(context, services, service)
+            slots = _cached_day_slots(context, service.id, duration_min, day, settings)
+            if slots is None:
                 slots = await list_available_slots_for_duration(s, settings, service, day, duration_min)
-            else:
-                slots = await list_available_slots_for_service(s, settings, service, day)
 
     if not slots:
         return await update.callback_query.message.edit_text("На эту дату нет свободных слотов. Выбери другую дату.")
@@ -976,7 +1031,7 @@ async def handle_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
     total_price = sum(Decimal(str(s.price)) for s in selected_services)
     duration_min = _display_duration_for_services(selected_services)
     price_label = format_price(total_price)
-    local_dt = start_local.astimezone(settings.tz) if start_local.tzinfo else settings.tz.localize(start_local)
+    local_dt = start_local.astimezone(settings.tz) if start_local.tzinfo else start_local.replace(tzinfo=settings.tz)
     await msg.reply_text(
         "Проверь, всё ли верно перед отправкой заявки:\n"
         f"Услуги: {_services_label(selected_services)}\n"
@@ -1133,11 +1188,11 @@ async def admin_pick_time_from_slots(update: Update, context: ContextTypes.DEFAU
             return await query.message.reply_text("Услуга недоступна.", reply_markup=admin_menu_kb())
 
         if start_local.tzinfo is None:
-            start_local = settings.tz.localize(start_local)
+            start_local = start_local.replace(tzinfo=settings.tz)
         duration_min = int(context.user_data.get(K_ADMIN_DURATION) or service.duration_min)
         end_local = compute_slot_end_for_duration(start_local, duration_min, service, settings)
-        work_start_local = settings.tz.localize(datetime.combine(start_local.date(), settings.work_start))
-        work_end_local = settings.tz.localize(datetime.combine(start_local.date(), settings.work_end))
+        work_start_local = datetime.combine(start_local.date(), settings.work_start).replace(tzinfo=settings.tz)
+        work_end_local = datetime.combine(start_local.date(), settings.work_end).replace(tzinfo=settings.tz)
         if start_local < work_start_local or end_local > work_end_local:
             return await query.message.reply_text(
                 f"Время вне рабочего диапазона ({settings.work_start.strftime('%H:%M')}–{settings.work_end.strftime('%H:%M')})."
@@ -1208,15 +1263,15 @@ async def handle_admin_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
             _clear_admin_booking(context)
             return await update.message.reply_text("Услуга недоступна.", reply_markup=admin_menu_kb())
 
-        start_local = settings.tz.localize(datetime.combine(day, time(hh_i, mm_i)))
+        start_local = datetime.combine(day, time(hh_i, mm_i)).replace(tzinfo=settings.tz)
         now_local = datetime.now(tz=settings.tz)
         if start_local < now_local:
             if await _maybe_abort_after_errors():
                 return
             return await update.message.reply_text("Нельзя выбрать время в прошлом. Введи другое время.")
 
-        work_start_local = settings.tz.localize(datetime.combine(day, settings.work_start))
-        work_end_local = settings.tz.localize(datetime.combine(day, settings.work_end))
+        work_start_local = datetime.combine(day, settings.work_start).replace(tzinfo=settings.tz)
+        work_end_local = datetime.combine(day, settings.work_end).replace(tzinfo=settings.tz)
         duration_min = int(context.user_data.get(K_ADMIN_DURATION) or service.duration_min)
         end_local = compute_slot_end_for_duration(start_local, duration_min, service, settings)
         if start_local < work_start_local or end_local > work_end_local:
@@ -1286,7 +1341,7 @@ async def handle_break_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
     async with session_factory() as s:
         settings = await get_settings(s, cfg.timezone)
         day = date.fromisoformat(day_iso)
-        start_local = settings.tz.localize(datetime.combine(day, t))
+        start_local = datetime.combine(day, t).replace(tzinfo=settings.tz)
         duration_min = int(context.user_data.get(K_BREAK_DURATION, 0))
         if duration_min <= 0:
             _clear_break(context)
@@ -1629,9 +1684,10 @@ async def handle_admin_visit_price(update: Update, context: ContextTypes.DEFAULT
             if price_override is not None:
                 appt.price_override = price_override
             appt.visit_confirmed = True
-            if appt.status == AppointmentStatus.Booked and appt.end_dt <= datetime.now(tz=pytz.UTC):
+            now_utc = datetime.now(tz=timezone.utc)
+            if appt.status == AppointmentStatus.Booked and appt.end_dt <= now_utc:
                 appt.status = AppointmentStatus.Completed
-            appt.updated_at = datetime.now(tz=pytz.UTC)
+            appt.updated_at = now_utc
             price_label = format_price(appt.price_override if appt.price_override is not None else appt.service.price)
 
     _clear_admin_visit(context)
@@ -1651,6 +1707,9 @@ async def finalize_request(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return await update.callback_query.message.edit_text("Сессия сброшена. Нажми «Записаться» заново.")
 
     start_local = datetime.fromisoformat(slot_iso)
+    now_utc = datetime.now(tz=timezone.utc)
+    # после попытки записи (успешной или нет) слоты нужно пересчитать
+    context.user_data.pop(K_SLOTS_CACHE, None)
 
     async with session_factory() as s:
         async with s.begin():
@@ -1681,6 +1740,7 @@ async def finalize_request(update: Update, context: ContextTypes.DEFAULT_TYPE):
                         duration_min=duration_min,
                         price_override=total_price,
                         admin_comment=admin_comment,
+                        now_utc=now_utc,
                     )
                 else:
                     appt = await create_hold_appointment(
@@ -1690,6 +1750,7 @@ async def finalize_request(update: Update, context: ContextTypes.DEFAULT_TYPE):
                         service,
                         start_local,
                         context.user_data.get(K_COMMENT),
+                        now_utc=now_utc,
                     )
             except ValueError as e:
                 code = str(e)
@@ -1731,9 +1792,10 @@ async def finalize_request(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def show_my_appointments(update: Update, context: ContextTypes.DEFAULT_TYPE):
     cfg: Config = context.bot_data["cfg"]
     session_factory = context.bot_data["session_factory"]
+    now_utc = datetime.now(tz=timezone.utc)
     async with session_factory() as s:
         settings = await get_settings(s, cfg.timezone)
-        appts = await get_user_appointments(s, update.effective_user.id, limit=10)
+        appts = await get_user_appointments(s, update.effective_user.id, limit=10, now_utc=now_utc)
     if not appts:
         await update.message.reply_text("У вас пока нет записей.", reply_markup=main_menu_for(update, context))
         return
@@ -1742,9 +1804,10 @@ async def show_my_appointments(update: Update, context: ContextTypes.DEFAULT_TYP
 async def show_my_appointments_from_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
     cfg: Config = context.bot_data["cfg"]
     session_factory = context.bot_data["session_factory"]
+    now_utc = datetime.now(tz=timezone.utc)
     async with session_factory() as s:
         settings = await get_settings(s, cfg.timezone)
-        appts = await get_user_appointments(s, update.effective_user.id, limit=10)
+        appts = await get_user_appointments(s, update.effective_user.id, limit=10, now_utc=now_utc)
     if not appts:
         return await update.callback_query.message.edit_text("У вас пока нет записей.")
     await update.callback_query.message.edit_text("Ваши записи:", reply_markup=my_appts_kb(appts, settings.tz))
@@ -1753,9 +1816,10 @@ async def show_my_appointments_from_cb(update: Update, context: ContextTypes.DEF
 async def show_my_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
     cfg: Config = context.bot_data["cfg"]
     session_factory = context.bot_data["session_factory"]
+    now_utc = datetime.now(tz=timezone.utc)
     async with session_factory() as s:
         settings = await get_settings(s, cfg.timezone)
-        appts = await get_user_appointments_history(s, update.effective_user.id, limit=10)
+        appts = await get_user_appointments_history(s, update.effective_user.id, limit=10, now_utc=now_utc)
     if not appts:
         await update.message.reply_text("История пустая.", reply_markup=main_menu_for(update, context))
         return
@@ -1764,9 +1828,10 @@ async def show_my_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def show_my_history_from_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
     cfg: Config = context.bot_data["cfg"]
     session_factory = context.bot_data["session_factory"]
+    now_utc = datetime.now(tz=timezone.utc)
     async with session_factory() as s:
         settings = await get_settings(s, cfg.timezone)
-        appts = await get_user_appointments_history(s, update.effective_user.id, limit=10)
+        appts = await get_user_appointments_history(s, update.effective_user.id, limit=10, now_utc=now_utc)
     if not appts:
         return await update.callback_query.message.edit_text("История пустая.")
     await update.callback_query.message.edit_text("История:", reply_markup=my_appts_kb(appts, settings.tz))
@@ -1803,7 +1868,7 @@ async def client_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE, appt
         async with s.begin():
             settings = await get_settings(s, cfg.timezone)
             appt = await get_appointment(s, appt_id)
-            ok = await cancel_by_client(s, settings, appt)
+            ok = await cancel_by_client(s, settings, appt, now_utc=datetime.now(tz=timezone.utc))
             if not ok:
                 return await update.callback_query.message.edit_text(
                     f"Отмена недоступна менее чем за {settings.cancel_limit_hours} часов. Напишите мастеру напрямую."
@@ -1829,7 +1894,7 @@ async def start_reschedule(update: Update, context: ContextTypes.DEFAULT_TYPE, a
                 return await update.callback_query.message.edit_text("Нет доступа.")
             if appt.status != AppointmentStatus.Booked:
                 return await update.callback_query.message.edit_text("Перенос доступен только для подтверждённых записей.")
-            now_utc = datetime.now(tz=pytz.UTC)
+            now_utc = datetime.now(tz=timezone.utc)
             if now_utc > (appt.start_dt - timedelta(hours=settings.cancel_limit_hours)):
                 return await update.callback_query.message.edit_text("До визита осталось слишком мало времени. Для переноса свяжитесь напрямую.")
 
@@ -1887,7 +1952,7 @@ async def confirm_reschedule_request(update: Update, context: ContextTypes.DEFAU
     if new_start.tzinfo:
         new_local = new_start.astimezone(settings.tz)
     else:
-        new_local = settings.tz.localize(new_start)
+        new_local = new_start.replace(tzinfo=settings.tz)
     new_dt = new_local.strftime('%d.%m %H:%M')
     old_dt = appt.start_dt.astimezone(settings.tz).strftime('%d.%m %H:%M')
     await update.callback_query.message.edit_text(
@@ -1988,6 +2053,14 @@ async def admin_action_reject(update: Update, context: ContextTypes.DEFAULT_TYPE
             )
     await update.callback_query.message.edit_text("Отклонено ❌")
 
+def _client_labels(rows) -> dict[int, str]:
+    """Подпись клиента на каждого client_user_id — у одного клиента бывает несколько записей."""
+    labels: dict[int, str] = {}
+    for r in rows:
+        if r.client_user_id not in labels:
+            labels[r.client_user_id] = client_label_for(r.client_full_name, r.client_username, r.client_tg_id)
+    return labels
+
 def _is_admin_created(appt) -> bool:
     return (appt.admin_comment or "").strip().lower() == "создано мастером"
 
@@ -2028,9 +2101,10 @@ async def admin_visit_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE
         async with s.begin():
             appt = await get_appointment(s, appt_id)
             appt.visit_confirmed = True
-            if appt.status == AppointmentStatus.Booked and appt.end_dt <= datetime.now(tz=pytz.UTC):
+            now_utc = datetime.now(tz=timezone.utc)
+            if appt.status == AppointmentStatus.Booked and appt.end_dt <= now_utc:
                 appt.status = AppointmentStatus.Completed
-            appt.updated_at = datetime.now(tz=pytz.UTC)
+            appt.updated_at = now_utc
 
     _clear_admin_visit(context)
     await update.callback_query.message.edit_text("Визит подтверждён ✅")
@@ -2130,7 +2204,7 @@ async def admin_confirm_reschedule(update: Update, context: ContextTypes.DEFAULT
     if new_start.tzinfo:
         new_local = new_start.astimezone(settings.tz)
     else:
-        new_local = settings.tz.localize(new_start)
+        new_local = new_start.replace(tzinfo=settings.tz)
     new_dt = new_local.strftime('%d.%m %H:%M')
     old_dt = appt.start_dt.astimezone(settings.tz).strftime('%d.%m %H:%M')
     await update.callback_query.message.edit_text(
@@ -2261,29 +2335,78 @@ async def reminder_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE, a
         async with s.begin():
             appt = await get_appointment(s, appt_id)
             appt.visit_confirmed = True
-            appt.updated_at = datetime.now(tz=pytz.UTC)
+            appt.updated_at = datetime.now(tz=timezone.utc)
     await update.callback_query.message.edit_text("Отлично, визит подтверждён ✅")
 
 async def reminder_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE, appt_id: int):
     return await client_cancel(update, context, appt_id)
 
-def _slot_status_for_time(
-    slot_start_local: datetime,
-    spans: list[tuple[datetime, datetime, AppointmentStatus]],
-    break_spans: list[tuple[datetime, datetime]] | None = None,
-) -> AppointmentStatus | str | None:
-    if break_spans:
-        for start_local, end_local in break_spans:
-            if start_local <= slot_start_local < end_local:
-                return "break"
-    has_hold = False
-    for start_local, end_local, status in spans:
-        if start_local <= slot_start_local < end_local:
-            if status == AppointmentStatus.Booked:
-                return AppointmentStatus.Booked
-            if status == AppointmentStatus.Hold:
-                has_hold = True
-    return AppointmentStatus.Hold if has_hold else None
+def _slot_statuses(
+    slot_starts: range,
+    spans: list[tuple[int, int, AppointmentStatus]],
+    break_spans: list[tuple[int, int]] | None = None,
+) -> list[AppointmentStatus | str | None]:
+    """
+    Статус каждого слота (перерыв > подтверждено > ожидает > свободно).
+    Все моменты — целые секунды epoch. Старты слотов — арифметическая прогрессия,
+    поэтому интервал [s, e) сразу переводится в диапазон индексов слотов, а покрытие
+    считается разностными массивами: O(слоты + интервалы), без сортировки.
+    """
+    n = len(slot_starts)
+    if n == 0:
+        return []
+    first = slot_starts.start
+    step = slot_starts.step
+    breaks_diff = [0] * (n + 1)
+    booked_diff = [0] * (n + 1)
+    hold_diff = [0] * (n + 1)
+
+    def mark(diff: list[int], start_ts: int, end_ts: int) -> None:
+        # слот i занят, если start_ts <= first + i*step < end_ts; -((a - b) // step) == ceil((b - a) / step)
+        lo = max(0, -((first - start_ts) // step))
+        hi = min(n, -((first - end_ts) // step))
+        if lo < hi:
+            diff[lo] += 1
+            diff[hi] -= 1
+
+    for start_ts, end_ts in break_spans or []:
+        mark(breaks_diff, start_ts, end_ts)
+    for start_ts, end_ts, status in spans:
+        if status == AppointmentStatus.Booked:
+            mark(booked_diff, start_ts, end_ts)
+        elif status == AppointmentStatus.Hold:
+            mark(hold_diff, start_ts, end_ts)
+
+    out: list[AppointmentStatus | str | None] = []
+    in_break = in_booked = in_hold = 0
+    for i in range(n):
+        in_break += breaks_diff[i]
+        in_booked += booked_diff[i]
+        in_hold += hold_diff[i]
+        if in_break:
+            out.append("break")
+        elif in_booked:
+            out.append(AppointmentStatus.Booked)
+        elif in_hold:
+            out.append(AppointmentStatus.Hold)
+        else:
+            out.append(None)
+    return out
+
+def _slot_grid(day: date, settings: SettingsView) -> tuple[range, list[str]]:
+    """
+    Сетка слотов рабочего дня: старты в секундах epoch и подписи HH:MM.
+    Подписи считаются из минут от полуночи, без datetime на каждый слот.
+    """
+    step_min = settings.slot_step_min
+    minutes = range(settings.work_start_min, settings.work_end_min, step_min)
+    start_ts = int(datetime.combine(day, settings.work_start, tzinfo=settings.tz).timestamp())
+    starts = range(start_ts, start_ts + len(minutes) * step_min * 60, step_min * 60)
+    labels = [f"{m // 60:02d}:{m % 60:02d}" for m in minutes]
+    return starts, labels
+
+def _epoch_spans(appts: list) -> list[tuple[int, int, AppointmentStatus]]:
+    return [(int(a.start_dt.timestamp()), int(a.end_dt.timestamp()), a.status) for a in appts]
 
 def _build_day_timeline(
     day: date,
@@ -2292,19 +2415,11 @@ def _build_day_timeline(
     breaks: list[BlockedInterval] | None = None,
     slots_per_line: int = 4,
 ) -> str:
-    work_start_local = settings.tz.localize(datetime.combine(day, settings.work_start))
-    work_end_local = settings.tz.localize(datetime.combine(day, settings.work_end))
-    step = timedelta(minutes=settings.slot_step_min)
-    spans = [
-        (a.start_dt.astimezone(settings.tz), a.end_dt.astimezone(settings.tz), a.status)
-        for a in appts
+    spans = _epoch_spans(appts)
+    break_spans = [
+        (int(b.start_dt.timestamp()), int(b.end_dt.timestamp()))
+        for b in (breaks or [])
     ]
-    break_spans = []
-    if breaks:
-        break_spans = [
-            (b.start_dt.astimezone(settings.tz), b.end_dt.astimezone(settings.tz))
-            for b in breaks
-        ]
 
     def slot_symbol(status: AppointmentStatus | str | None) -> str:
         if status == AppointmentStatus.Booked:
@@ -2315,21 +2430,12 @@ def _build_day_timeline(
             return "🟡"
         return "🟩"
 
-    slots: list[str] = []
-    cursor = work_start_local
-    while cursor < work_end_local:
-        status = _slot_status_for_time(cursor, spans, break_spans)
-        slots.append(f"{cursor.strftime('%H:%M')}")
-        cursor += step
-
-    status_symbols = []
-    cursor = work_start_local
-    while cursor < work_end_local:
-        status = _slot_status_for_time(cursor, spans, break_spans)
-        status_symbols.append(slot_symbol(status))
-        cursor += step
-
-    entries = [f"{time_label} {symbol}" for time_label, symbol in zip(slots, status_symbols)]
+    slot_starts, labels = _slot_grid(day, settings)
+    statuses = _slot_statuses(slot_starts, spans, break_spans)
+    entries = [
+        f"{label} {slot_symbol(status)}"
+        for label, status in zip(labels, statuses)
+    ]
     col_width = max((len(entry) for entry in entries), default=0) + 2
     lines = ["🧭 График слотов:"]
     for idx in range(0, len(entries), slots_per_line):
@@ -2365,13 +2471,7 @@ def _build_day_timeline_image(
     slots_per_line: int = 4,
 ) -> BytesIO:
     style = DAY_TIMELINE_STYLE
-    work_start_local = settings.tz.localize(datetime.combine(day, settings.work_start))
-    work_end_local = settings.tz.localize(datetime.combine(day, settings.work_end))
-    step = timedelta(minutes=settings.slot_step_min)
-    spans = [
-        (a.start_dt.astimezone(settings.tz), a.end_dt.astimezone(settings.tz), a.status)
-        for a in appts
-    ]
+    spans = _epoch_spans(appts)
     break_entries: list[tuple[datetime, datetime, str]] = []
     if breaks:
         break_entries = [
@@ -2382,7 +2482,10 @@ def _build_day_timeline_image(
             )
             for b in breaks
         ]
-    break_spans = [(start, end) for start, end, _ in break_entries]
+    break_spans = [
+        (int(b.start_dt.timestamp()), int(b.end_dt.timestamp()))
+        for b in (breaks or [])
+    ]
 
     def slot_color(status: AppointmentStatus | str | None) -> tuple[int, int, int]:
         if status == AppointmentStatus.Booked:
@@ -2393,12 +2496,10 @@ def _build_day_timeline_image(
             return style["slot_colors"]["break"]
         return style["slot_colors"]["free"]
 
-    slots: list[tuple[str, AppointmentStatus | str | None]] = []
-    cursor = work_start_local
-    while cursor < work_end_local:
-        status = _slot_status_for_time(cursor, spans, break_spans)
-        slots.append((cursor.strftime("%H:%M"), status))
-        cursor += step
+    slot_starts, labels = _slot_grid(day, settings)
+    slots: list[tuple[str, AppointmentStatus | str | None]] = list(
+        zip(labels, _slot_statuses(slot_starts, spans, break_spans))
+    )
 
     title_font = _pick_font(style["font_sizes"]["title"])
     time_font = _pick_font(style["font_sizes"]["time"])
@@ -2546,8 +2647,8 @@ def _build_week_schedule_image(
 ) -> BytesIO:
     style = WEEK_SCHEDULE_STYLE
     days = [start_day + timedelta(days=offset) for offset in range(7)]
-    work_start_minutes = settings.work_start.hour * 60 + settings.work_start.minute
-    work_end_minutes = settings.work_end.hour * 60 + settings.work_end.minute
+    work_start_minutes = settings.work_start_min
+    work_end_minutes = settings.work_end_min
     total_minutes = max(work_end_minutes - work_start_minutes, 60)
 
     title_font = _pick_font(style["font_sizes"]["title"])
@@ -2641,8 +2742,8 @@ def _build_week_schedule_image(
         else:
             local_start = item.start_dt.astimezone(settings.tz)
             local_end = item.end_dt.astimezone(settings.tz)
-            client_label = item.client.full_name or (f"@{item.client.username}" if item.client.username else str(item.client.tg_id))
-            service_label = appointment_services_label(item)
+            client_label = client_label_for(item.client_full_name, item.client_username, item.client_tg_id)
+            service_label = services_label_for(item.admin_comment, item.service_name)
             label_lines = [client_label]
             if service_label:
                 label_lines.append(service_label)
@@ -2709,8 +2810,8 @@ def _build_single_day_schedule_image(
 ) -> BytesIO:
     style = WEEK_SCHEDULE_STYLE
     days = [day]
-    work_start_minutes = settings.work_start.hour * 60 + settings.work_start.minute
-    work_end_minutes = settings.work_end.hour * 60 + settings.work_end.minute
+    work_start_minutes = settings.work_start_min
+    work_end_minutes = settings.work_end_min
     total_minutes = max(work_end_minutes - work_start_minutes, 60)
 
     title_font = _pick_font(style["font_sizes"]["title"])
@@ -2804,8 +2905,8 @@ def _build_single_day_schedule_image(
         else:
             local_start = item.start_dt.astimezone(settings.tz)
             local_end = item.end_dt.astimezone(settings.tz)
-            client_label = item.client.full_name or (f"@{item.client.username}" if item.client.username else str(item.client.tg_id))
-            service_label = appointment_services_label(item)
+            client_label = client_label_for(item.client_full_name, item.client_username, item.client_tg_id)
+            service_label = services_label_for(item.admin_comment, item.service_name)
             label_lines = [client_label]
             if service_label:
                 label_lines.append(service_label)
@@ -2876,25 +2977,24 @@ async def admin_day_view(update: Update, context: ContextTypes.DEFAULT_TYPE, off
             await _sync_break_rules(s, settings)
             day = (datetime.now(tz=settings.tz) + timedelta(days=offset_days)).date()
             appts = await admin_list_appointments_for_day(s, settings.tz, day)
-            start_local = settings.tz.localize(datetime.combine(day, datetime.min.time()))
-            end_local = start_local + timedelta(days=1)
-            breaks = await list_future_breaks(
-                s,
-                start_local.astimezone(pytz.UTC),
-                end_local.astimezone(pytz.UTC),
-            )
+            start_utc, end_utc = day_bounds_utc(day, settings.tz)
+            breaks = await list_future_breaks(s, start_utc, end_utc)
 
     lines = [f"📅 Записи на {day.strftime('%d.%m')} ({RU_WEEKDAYS[day.weekday()]}):"]
     if not appts:
         lines.append("• Записей нет.")
     else:
+        tz = settings.tz
+        clients = _client_labels(appts)
         for a in appts:
-            start_t = a.start_dt.astimezone(settings.tz).strftime("%H:%M")
-            end_t = a.end_dt.astimezone(settings.tz).strftime("%H:%M")
-            client = a.client.full_name or (f"@{a.client.username}" if a.client.username else str(a.client.tg_id))
-            phone = a.client.phone or "—"
-            price = format_price(a.price_override if a.price_override is not None else a.service.price)
-            service_label = appointment_services_label(a)
+            s_local = a.start_dt.astimezone(tz)
+            e_local = a.end_dt.astimezone(tz)
+            start_t = f"{s_local.hour:02d}:{s_local.minute:02d}"
+            end_t = f"{e_local.hour:02d}:{e_local.minute:02d}"
+            client = clients[a.client_user_id]
+            phone = a.client_phone or "—"
+            price = format_price(a.price_override if a.price_override is not None else a.service_price)
+            service_label = services_label_for(a.admin_comment, a.service_name)
             lines.append(
                 f"• {start_t}–{end_t} | {status_ru(a.status.value)} | {service_label} | {price} | {client} | {phone}"
             )
@@ -2921,7 +3021,7 @@ async def admin_day_view(update: Update, context: ContextTypes.DEFAULT_TYPE, off
         if a.status == AppointmentStatus.Booked:
             start_t = a.start_dt.astimezone(settings.tz).strftime("%H:%M")
             await update.message.reply_text(
-                f"Запись • {start_t} • {appointment_services_label(a)}",
+                f"Запись • {start_t} • {services_label_for(a.admin_comment, a.service_name)}",
                 reply_markup=admin_manage_appt_kb(a.id, allow_reschedule=_is_admin_created(a)),
             )
 
@@ -2936,17 +3036,17 @@ async def admin_week_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
             settings = await get_settings(s, cfg.timezone)
             await _sync_break_rules(s, settings)
             start_day = datetime.now(tz=settings.tz).date()
-            start_local = settings.tz.localize(datetime.combine(start_day, datetime.min.time()))
+            start_local = datetime.combine(start_day, datetime.min.time()).replace(tzinfo=settings.tz)
             end_local = start_local + timedelta(days=7)
             appts = await admin_list_appointments_range(
                 s,
-                start_local.astimezone(pytz.UTC),
-                end_local.astimezone(pytz.UTC),
+                start_local.astimezone(timezone.utc),
+                end_local.astimezone(timezone.utc),
             )
             breaks = await list_future_breaks(
                 s,
-                start_local.astimezone(pytz.UTC),
-                end_local.astimezone(pytz.UTC),
+                start_local.astimezone(timezone.utc),
+                end_local.astimezone(timezone.utc),
             )
 
     week_image = _build_week_schedule_image(start_day, settings, appts, breaks)
@@ -2966,60 +3066,66 @@ async def admin_booked_month_view(update: Update, context: ContextTypes.DEFAULT_
         async with s.begin():
             settings = await get_settings(s, cfg.timezone)
             await _sync_break_rules(s, settings)
-            now_local = datetime.now(tz=settings.tz)
-            end_local = now_local + timedelta(days=30)
-            appts = await admin_list_appointments_range(
-                s,
-                now_local.astimezone(pytz.UTC),
-                end_local.astimezone(pytz.UTC),
-            )
+            now_utc = datetime.now(tz=timezone.utc)
+            end_utc = now_utc + timedelta(days=30)
+            appts = await admin_list_appointments_range(s, now_utc, end_utc)
 
     lines = ["🗓 Все записи на месяц вперёд:"]
     if not appts:
         lines.append("• Записей нет.")
     else:
+        # Услуги и клиенты в месячной выборке повторяются — форматируем каждого один раз.
+        svc_price: dict[int, str] = {}
         for a in appts:
-            local_dt = a.start_dt.astimezone(settings.tz)
-            end_dt = a.end_dt.astimezone(settings.tz)
-            day_label = f"{local_dt.strftime('%d.%m')} ({RU_WEEKDAYS[local_dt.weekday()]})"
-            client = a.client.full_name or (f"@{a.client.username}" if a.client.username else str(a.client.tg_id))
-            phone = a.client.phone or "—"
-            price = format_price(a.price_override if a.price_override is not None else a.service.price)
-            service_label = appointment_services_label(a)
+            if a.service_id not in svc_price:
+                svc_price[a.service_id] = format_price(a.service_price)
+        clients = _client_labels(appts)
+        tz = settings.tz
+        for a in appts:
+            s_local = a.start_dt.astimezone(tz)
+            e_local = a.end_dt.astimezone(tz)
+            day_label = f"{s_local.day:02d}.{s_local.month:02d} ({RU_WEEKDAYS[s_local.weekday()]})"
+            client = clients[a.client_user_id]
+            phone = a.client_phone or "—"
+            price = format_price(a.price_override) if a.price_override is not None else svc_price[a.service_id]
+            service_label = services_label_for(a.admin_comment, a.service_name)
             status_label = status_ru(a.status.value)
             lines.append(
-                f"• {day_label} {local_dt.strftime('%H:%M')}–{end_dt.strftime('%H:%M')} | "
+                f"• {day_label} {s_local.hour:02d}:{s_local.minute:02d}–{e_local.hour:02d}:{e_local.minute:02d} | "
                 f"{status_label} | {service_label} | {price} | {client} | {phone}"
             )
 
     await update.message.reply_text("\n".join(lines), reply_markup=admin_menu_kb())
 
+    # Четыре недели выбираются двумя запросами на весь диапазон и режутся по неделям
+    # в памяти, а не 4×2 запросами по неделе.
     session_factory = context.bot_data["session_factory"]
     async with session_factory() as s:
         settings = await get_settings(s, cfg.timezone)
         start_day = datetime.now(tz=settings.tz).date()
-        for week_index in range(4):
-            week_start = start_day + timedelta(days=7 * week_index)
-            week_start_local = settings.tz.localize(datetime.combine(week_start, datetime.min.time()))
-            week_end_local = week_start_local + timedelta(days=7)
-            appts = await admin_list_appointments_range(
-                s,
-                week_start_local.astimezone(pytz.UTC),
-                week_end_local.astimezone(pytz.UTC),
-            )
-            breaks = await list_future_breaks(
-                s,
-                week_start_local.astimezone(pytz.UTC),
-                week_end_local.astimezone(pytz.UTC),
-            )
-            week_image = _build_week_schedule_image(week_start, settings, appts, breaks)
-            week_end = week_start + timedelta(days=6)
-            caption = f"📆 Неделя {week_index + 1} • {week_start.strftime('%d.%m')}–{week_end.strftime('%d.%m')}"
-            await update.message.reply_photo(
-                photo=week_image,
-                caption=caption,
-                reply_markup=admin_menu_kb(),
-            )
+        range_start_utc = datetime.combine(start_day, time.min, tzinfo=settings.tz).astimezone(timezone.utc)
+        range_end_utc = datetime.combine(
+            start_day + timedelta(days=28), time.min, tzinfo=settings.tz,
+        ).astimezone(timezone.utc)
+        all_appts = await admin_list_appointments_range(s, range_start_utc, range_end_utc)
+        all_breaks = await list_future_breaks(s, range_start_utc, range_end_utc)
+
+    for week_index in range(4):
+        week_start = start_day + timedelta(days=7 * week_index)
+        week_start_utc = datetime.combine(week_start, time.min, tzinfo=settings.tz).astimezone(timezone.utc)
+        week_end_utc = datetime.combine(
+            week_start + timedelta(days=7), time.min, tzinfo=settings.tz,
+        ).astimezone(timezone.utc)
+        appts = [a for a in all_appts if week_start_utc <= a.start_dt < week_end_utc]
+        breaks = [b for b in all_breaks if b.end_dt >= week_start_utc and b.start_dt < week_end_utc]
+        week_image = _build_week_schedule_image(week_start, settings, appts, breaks)
+        week_end = week_start + timedelta(days=6)
+        caption = f"📆 Неделя {week_index + 1} • {week_start.strftime('%d.%m')}–{week_end.strftime('%d.%m')}"
+        await update.message.reply_photo(
+            photo=week_image,
+            caption=caption,
+            reply_markup=admin_menu_kb(),
+        )
 
 async def admin_cancel_break_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
     cfg: Config = context.bot_data["cfg"]
@@ -3067,11 +3173,18 @@ async def admin_holds_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not holds:
         return await update.message.reply_text("HOLD-заявок нет.", reply_markup=admin_menu_kb())
 
+    tz = settings.tz
+    clients = _client_labels(holds)
     lines = ["🧾 HOLD-заявки:"]
     for a in holds:
-        t = a.start_dt.astimezone(settings.tz).strftime("%d.%m %H:%M")
-        exp = a.hold_expires_at.astimezone(settings.tz).strftime("%H:%M") if a.hold_expires_at else "—"
-        client = a.client.full_name or (f"@{a.client.username}" if a.client.username else str(a.client.tg_id))
-        lines.append(f"• {t} | #{a.id} | {appointment_services_label(a)} | {client} | hold до {exp}")
+        s_local = a.start_dt.astimezone(tz)
+        t = f"{s_local.day:02d}.{s_local.month:02d} {s_local.hour:02d}:{s_local.minute:02d}"
+        if a.hold_expires_at:
+            x_local = a.hold_expires_at.astimezone(tz)
+            exp = f"{x_local.hour:02d}:{x_local.minute:02d}"
+        else:
+            exp = "—"
+        client = clients[a.client_user_id]
+        lines.append(f"• {t} | #{a.id} | {services_label_for(a.admin_comment, a.service_name)} | {client} | hold до {exp}")
 
     await update.message.reply_text("\n".join(lines), reply_markup=admin_menu_kb())
@@ -1,5 +1,6 @@
 from __future__ import annotations
-from datetime import date, datetime
+from datetime import date, datetime, tzinfo
+from functools import lru_cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from app.models import Service, Appointment
 from app.utils import format_price, appointment_services_label
@@ -12,13 +13,51 @@ STATUS_RU = {
     "Completed": "Завершена",
 }
 
-RU_WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-
 def status_ru(v: str) -> str:
     return STATUS_RU.get(v, v)
 
-def _format_date_ru(d: date) -> str:
-    return f"{d.strftime('%d.%m')} ({RU_WEEKDAYS[d.weekday()]})"
+RU_WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+SLOTS_PER_ROW = 4
+
+@lru_cache(maxsize=512)
+def _date_parts(d: date) -> tuple[str, str]:
+    return f"{d.day:02d}.{d.month:02d} ({RU_WEEKDAYS[d.weekday()]})", d.isoformat()
+
+# Ключ — (unix-время, tzinfo): aware datetime сравниваются без учёта fold, и два
+# разных момента в час перевода часов попали бы в одну запись кэша; одинаковый
+# момент в разных зонах даёт разный isoformat. Сетка слотов повторяется изо дня
+# в день, так что кэш быстро «прогревается».
+@lru_cache(maxsize=2048)
+def _slot_parts(ts: int, tz: tzinfo | None) -> tuple[str, str]:
+    dt = datetime.fromtimestamp(ts, tz)
+    return f"{dt.hour:02d}:{dt.minute:02d}", dt.isoformat()
+
+def _service_label(s: Service, marker: str = "") -> str:
+    return f"{marker}{s.name} • {int(s.duration_min)} мин • {format_price(s.price)}"
+
+def _service_rows(services: list[Service], prefix: str) -> list[list[InlineKeyboardButton]]:
+    return [[InlineKeyboardButton(_service_label(s), callback_data=f"{prefix}:{s.id}")] for s in services]
+
+def _date_rows(dates: list[date], prefix: str) -> list[list[InlineKeyboardButton]]:
+    rows = []
+    for d in dates:
+        label, iso = _date_parts(d)
+        rows.append([InlineKeyboardButton(label, callback_data=f"{prefix}:{iso}")])
+    return rows
+
+def _slot_rows(slots_local: list[datetime], prefix: str) -> list[list[InlineKeyboardButton]]:
+    rows = []
+    row = []
+    for dt in slots_local:
+        label, iso = _slot_parts(int(dt.timestamp()), dt.tzinfo)
+        row.append(InlineKeyboardButton(label, callback_data=f"{prefix}:{iso}"))
+        if len(row) == SLOTS_PER_ROW:
+            rows.append(row)
+            row = []
+    if row:
+        rows.append(row)
+    return rows
 
 def main_menu_kb(is_admin: bool = False) -> ReplyKeyboardMarkup:
     kb = [
@@ -53,24 +92,15 @@ def phone_request_kb() -> ReplyKeyboardMarkup:
     )
 
 def services_kb(services: list[Service]) -> InlineKeyboardMarkup:
-    rows = []
-    for s in services:
-        price = format_price(s.price)
-        rows.append([InlineKeyboardButton(f"{s.name} • {int(s.duration_min)} мин • {price}", callback_data=f"svc:{s.id}")])
+    rows = _service_rows(services, "svc")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="back:main")])
     return InlineKeyboardMarkup(rows)
 
 def services_multi_kb(services: list[Service], selected_ids: set[int]) -> InlineKeyboardMarkup:
     rows = []
     for s in services:
-        price = format_price(s.price)
         marker = "✅ " if s.id in selected_ids else ""
-        rows.append([
-            InlineKeyboardButton(
-                f"{marker}{s.name} • {int(s.duration_min)} мин • {price}",
-                callback_data=f"svcsel:{s.id}",
-            )
-        ])
+        rows.append([InlineKeyboardButton(_service_label(s, marker), callback_data=f"svcsel:{s.id}")])
     action_row = [
         InlineKeyboardButton("➡️ Далее", callback_data="svcnext"),
         InlineKeyboardButton("🧹 Сбросить", callback_data="svcclear"),
@@ -80,57 +110,32 @@ def services_multi_kb(services: list[Service], selected_ids: set[int]) -> Inline
     return InlineKeyboardMarkup(rows)
 
 def admin_services_kb(services: list[Service]) -> InlineKeyboardMarkup:
-    rows = []
-    for s in services:
-        price = format_price(s.price)
-        rows.append([InlineKeyboardButton(f"{s.name} • {int(s.duration_min)} мин • {price}", callback_data=f"admsvc:{s.id}")])
+    rows = _service_rows(services, "admsvc")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="back:main")])
     return InlineKeyboardMarkup(rows)
 
 def dates_kb(dates: list[date]) -> InlineKeyboardMarkup:
-    rows = []
-    for d in dates:
-        rows.append([InlineKeyboardButton(_format_date_ru(d), callback_data=f"date:{d.isoformat()}")])
+    rows = _date_rows(dates, "date")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="back:services")])
     return InlineKeyboardMarkup(rows)
 
 def admin_dates_kb(dates: list[date]) -> InlineKeyboardMarkup:
-    rows = []
-    for d in dates:
-        rows.append([InlineKeyboardButton(_format_date_ru(d), callback_data=f"admdate:{d.isoformat()}")])
+    rows = _date_rows(dates, "admdate")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="admback:services")])
     return InlineKeyboardMarkup(rows)
 
 def break_dates_kb(dates: list[date]) -> InlineKeyboardMarkup:
-    rows = []
-    for d in dates:
-        rows.append([InlineKeyboardButton(_format_date_ru(d), callback_data=f"breakdate:{d.isoformat()}")])
+    rows = _date_rows(dates, "breakdate")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="back:main")])
     return InlineKeyboardMarkup(rows)
 
 def admin_slots_kb(slots_local: list[datetime]) -> InlineKeyboardMarkup:
-    rows = []
-    row = []
-    for dt in slots_local:
-        row.append(InlineKeyboardButton(dt.strftime("%H:%M"), callback_data=f"admtime:{dt.isoformat()}"))
-        if len(row) == 4:
-            rows.append(row)
-            row = []
-    if row:
-        rows.append(row)
+    rows = _slot_rows(slots_local, "admtime")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="admback:dates")])
     return InlineKeyboardMarkup(rows)
 
 def break_slots_kb(slots_local: list[datetime]) -> InlineKeyboardMarkup:
-    rows = []
-    row = []
-    for dt in slots_local:
-        row.append(InlineKeyboardButton(dt.strftime("%H:%M"), callback_data=f"breaktime:{dt.isoformat()}"))
-        if len(row) == 4:
-            rows.append(row)
-            row = []
-    if row:
-        rows.append(row)
+    rows = _slot_rows(slots_local, "breaktime")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="breakback:dates")])
     return InlineKeyboardMarkup(rows)
 
@@ -144,15 +149,7 @@ def break_repeat_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(rows)
 
 def slots_kb(slots_local: list[datetime]) -> InlineKeyboardMarkup:
-    rows = []
-    row = []
-    for dt in slots_local:
-        row.append(InlineKeyboardButton(dt.strftime("%H:%M"), callback_data=f"slot:{dt.isoformat()}"))
-        if len(row) == 4:
-            rows.append(row)
-            row = []
-    if row:
-        rows.append(row)
+    rows = _slot_rows(slots_local, "slot")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="back:dates")])
     return InlineKeyboardMarkup(rows)
 
@@ -179,12 +176,13 @@ def admin_manage_appt_kb(appt_id: int, *, allow_reschedule: bool = True) -> Inli
 def my_appts_kb(appts: list[Appointment], tz=None) -> InlineKeyboardMarkup:
     rows = []
     for a in appts:
-        dt = a.start_dt.astimezone(tz) if tz else a.start_dt.astimezone()
+        local = a.start_dt.astimezone(tz) if tz else a.start_dt.astimezone()
+        dt_label = f"{local.day:02d}.{local.month:02d} {local.hour:02d}:{local.minute:02d}"
         price = format_price(a.price_override if a.price_override is not None else a.service.price)
         service_label = appointment_services_label(a)
         rows.append([
             InlineKeyboardButton(
-                f"{dt.strftime('%d.%m %H:%M')} • {service_label} • {price} • {status_ru(a.status.value)}",
+                f"{dt_label} • {service_label} • {price} • {status_ru(a.status.value)}",
                 callback_data=f"my:{a.id}",
             )
         ])
@@ -199,22 +197,12 @@ def my_appt_actions_kb(appt_id: int) -> InlineKeyboardMarkup:
     ])
 
 def reschedule_dates_kb(dates: list[date]) -> InlineKeyboardMarkup:
-    rows = []
-    for d in dates:
-        rows.append([InlineKeyboardButton(_format_date_ru(d), callback_data=f"rdate:{d.isoformat()}")])
+    rows = _date_rows(dates, "rdate")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="myback:list")])
     return InlineKeyboardMarkup(rows)
 
 def reschedule_slots_kb(slots_local: list[datetime]) -> InlineKeyboardMarkup:
-    rows = []
-    row = []
-    for dt in slots_local:
-        row.append(InlineKeyboardButton(dt.strftime("%H:%M"), callback_data=f"rslot:{dt.isoformat()}"))
-        if len(row) == 4:
-            rows.append(row)
-            row = []
-    if row:
-        rows.append(row)
+    rows = _slot_rows(slots_local, "rslot")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="rback:dates")])
     return InlineKeyboardMarkup(rows)
 
@@ -231,22 +219,12 @@ def admin_reschedule_kb(appt_id: int) -> InlineKeyboardMarkup:
     ])
 
 def admin_reschedule_dates_kb(dates: list[date]) -> InlineKeyboardMarkup:
-    rows = []
-    for d in dates:
-        rows.append([InlineKeyboardButton(_format_date_ru(d), callback_data=f"admresched:date:{d.isoformat()}")])
+    rows = _date_rows(dates, "admresched:date")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="back:main")])
     return InlineKeyboardMarkup(rows)
 
 def admin_reschedule_slots_kb(slots_local: list[datetime]) -> InlineKeyboardMarkup:
-    rows = []
-    row = []
-    for dt in slots_local:
-        row.append(InlineKeyboardButton(dt.strftime("%H:%M"), callback_data=f"admresched:slot:{dt.isoformat()}"))
-        if len(row) == 4:
-            rows.append(row)
-            row = []
-    if row:
-        rows.append(row)
+    rows = _slot_rows(slots_local, "admresched:slot")
     rows.append([InlineKeyboardButton("⬅️ Назад", callback_data="admresched:back:dates")])
     return InlineKeyboardMarkup(rows)
 
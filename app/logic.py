@@ -1,16 +1,50 @@
 from __future__ import annotations
+from collections import OrderedDict
 from dataclasses import dataclass
-from datetime import datetime, timedelta, time, date
-import hashlib
-import pytz
-from sqlalchemy.orm import selectinload
+from datetime import datetime, timedelta, time, date, timezone
+from itertools import chain
+import asyncio
+import logging
+import time as _time
+from zoneinfo import ZoneInfo
+from sqlalchemy.orm import Session, contains_eager
 
 
-from sqlalchemy import select, text, and_, or_
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import event, select, update, text, and_, or_, bindparam, BigInteger, DateTime, Integer, Row
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
 
+from app.db import BotSession
 from app.models import User, Service, Setting, Appointment, AppointmentStatus, BlockedInterval, BreakRule
 
+_UTC = timezone.utc
+
+logger = logging.getLogger(__name__)
+
+def _now(session: AsyncSession) -> datetime:
+    """
+    Текущий момент UTC, один на транзакцию сессии: все хелперы внутри одной
+    операции видят одно и то же now. Сбрасывается по окончании транзакции.
+    """
+    now = session.info.get("now_utc")
+    if now is None:
+        now = session.info["now_utc"] = datetime.now(tz=_UTC)
+    return now
+
+def status_is(*statuses: AppointmentStatus):
+    """
+    Условие на Appointment.status с литералами в SQL (status = 'Booked'), а не
+    bind-параметрами: только так Postgres сопоставит его с предикатом частичного
+    индекса (main._INDEX_DDL) и в generic-плане подготовленного запроса.
+    """
+    if len(statuses) == 1:
+        return Appointment.status == bindparam(
+            None, statuses[0], type_=Appointment.status.type, literal_execute=True,
+        )
+    return Appointment.status.in_(bindparam(
+        None, list(statuses), type_=Appointment.status.type, expanding=True, literal_execute=True,
+    ))
+
 @dataclass(frozen=True)
 class SettingsView:
     slot_step_min: int
@@ -22,7 +56,12 @@ class SettingsView:
     work_start: time
     work_end: time
     work_days: set[int]
-    tz: pytz.BaseTzInfo
+    tz: ZoneInfo
+    # work_start/work_end в минутах от полуночи — для целочисленной арифметики слотов
+    work_start_min: int
+    work_end_min: int
+    # бит N выставлен, если weekday() == N — рабочий день
+    work_days_mask: int
 
 def _parse_hhmm(s: str) -> time:
     hh, mm = s.split(":")
@@ -35,10 +74,35 @@ async def seed_defaults_if_needed(session: AsyncSession, *, defaults: dict[str,
     for k, v in defaults.items():
         session.add(Setting(key=k, value=str(v)))
 
+SETTINGS_CACHE_TTL_S = 60.0
+
+# tz_name -> (monotonic-момент протухания, SettingsView). Настройки читаются на каждое
+# нажатие, а меняются только при старте (seed_db), поэтому держим их в процессе.
+_settings_cache: dict[str, tuple[float, SettingsView]] = {}
+_settings_lock = asyncio.Lock()
+
+def clear_settings_cache() -> None:
+    _settings_cache.clear()
+
 async def get_settings(session: AsyncSession, tz_name: str) -> SettingsView:
-    tz = pytz.timezone(tz_name)
-    rows = (await session.execute(select(Setting))).scalars().all()
-    m = {r.key: r.value for r in rows}
+    cached = _settings_cache.get(tz_name)
+    if cached is not None and cached[0] > _time.monotonic():
+        return cached[1]
+    # один запрос на всех: остальные ждут под замком и получают уже готовое значение
+    async with _settings_lock:
+        cached = _settings_cache.get(tz_name)
+        if cached is not None and cached[0] > _time.monotonic():
+            return cached[1]
+        view = await _load_settings(session, tz_name)
+        _settings_cache[tz_name] = (_time.monotonic() + SETTINGS_CACHE_TTL_S, view)
+        return view
+
+async def _load_settings(session: AsyncSession, tz_name: str) -> SettingsView:
+    tz = ZoneInfo(tz_name)
+    m = dict((await session.execute(select(Setting.key, Setting.value))).tuples().all())
+    work_start = _parse_hhmm(m["work_start"])
+    work_end = _parse_hhmm(m["work_end"])
+    work_days = {int(x) for x in m["work_days"].split(",") if x.strip() != ""}
 
     return SettingsView(
         slot_step_min=int(m["slot_step_min"]),
@@ -47,34 +111,78 @@ async def get_settings(session: AsyncSession, tz_name: str) -> SettingsView:
         booking_horizon_days=int(m["booking_horizon_days"]),
         hold_ttl_min=int(m["hold_ttl_min"]),
         cancel_limit_hours=int(m["cancel_limit_hours"]),
-        work_start=_parse_hhmm(m["work_start"]),
-        work_end=_parse_hhmm(m["work_end"]),
-        work_days=set(int(x) for x in m["work_days"].split(",") if x.strip() != ""),
+        work_start=work_start,
+        work_end=work_end,
+        work_days=work_days,
         tz=tz,
+        work_start_min=work_start.hour * 60 + work_start.minute,
+        work_end_min=work_end.hour * 60 + work_end.minute,
+        work_days_mask=sum(1 << wd for wd in work_days),
     )
 
 async def upsert_user(session: AsyncSession, tg_id: int, username: str | None, full_name: str | None) -> User:
-    q = await session.execute(select(User).where(User.tg_id == tg_id))
-    u = q.scalar_one_or_none()
-    now = datetime.now(tz=pytz.UTC)
-    if u:
-        u.username = username
-        u.full_name = full_name
-        return u
-    u = User(tg_id=tg_id, username=username, full_name=full_name, phone=None, created_at=now)
-    session.add(u)
-    await session.flush()
-    return u
+    """
+    Обычный случай — пользователь уже есть и не менялся: один SELECT без записи
+    (ORM пишет UPDATE только при реальном изменении полей). Новый пользователь
+    вставляется через ON CONFLICT, чтобы параллельный /start не падал на уникальности.
+    """
+    user = await session.scalar(select(User).where(User.tg_id == tg_id))
+    if user is not None:
+        user.username = username
+        user.full_name = full_name
+        return user
+
+    stmt = pg_insert(User).values(
+        tg_id=tg_id, username=username, full_name=full_name, phone=None, created_at=_now(session),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.tg_id],
+        set_={"username": stmt.excluded.username, "full_name": stmt.excluded.full_name},
+        where=or_(
+            User.username.is_distinct_from(stmt.excluded.username),
+            User.full_name.is_distinct_from(stmt.excluded.full_name),
+        ),
+    ).returning(User)
+    user = await session.scalar(stmt, execution_options={"populate_existing": True})
+    if user is None:
+        # строку успел вставить параллельный запрос с теми же значениями — UPDATE не нужен
+        user = await session.scalar(select(User).where(User.tg_id == tg_id))
+    return user
 
 async def set_user_phone(session: AsyncSession, tg_id: int, phone: str) -> None:
-    q = await session.execute(select(User).where(User.tg_id == tg_id))
-    u = q.scalar_one()
-    u.phone = phone
+    """Пользователь должен уже существовать (upsert_user), иначе — USER_NOT_FOUND."""
+    result = await session.execute(update(User).where(User.tg_id == tg_id).values(phone=phone))
+    if result.rowcount == 0:
+        raise ValueError("USER_NOT_FOUND")
+
+SERVICES_CACHE_TTL_S = 60.0
+
+# (monotonic-момент протухания, услуги). Услуги меняются редко, а читаются на каждое
+# нажатие «Записаться»/«Цены и услуги», поэтому держим их в процессе.
+_services_cache: tuple[float, list[Service]] | None = None
+_services_lock = asyncio.Lock()
+
+def clear_services_cache() -> None:
+    global _services_cache
+    _services_cache = None
 
 async def list_active_services(session: AsyncSession) -> list[Service]:
-    return (await session.execute(
-        select(Service).where(Service.is_active == True).order_by(Service.sort_order, Service.id)
-    )).scalars().all()
+    global _services_cache
+    cached = _services_cache
+    if cached is not None and cached[0] > _time.monotonic():
+        return cached[1]
+    async with _services_lock:
+        cached = _services_cache
+        if cached is not None and cached[0] > _time.monotonic():
+            return cached[1]
+        services = list((await session.execute(
+            select(Service).where(Service.is_active == True).order_by(Service.sort_order, Service.id)
+        )).scalars().all())
+        # отвязываем от сессии: объекты живут дольше неё и используются только на чтение
+        for svc in services:
+            session.expunge(svc)
+        _services_cache = (_time.monotonic() + SERVICES_CACHE_TTL_S, services)
+        return services
 
 async def ensure_default_services(session: AsyncSession) -> None:
     q = await session.execute(select(Service.id).limit(1))
@@ -86,16 +194,25 @@ async def ensure_default_services(session: AsyncSession) -> None:
         Service(name="Бикини классика", price=45, duration_min=40, buffer_min=0, is_active=True, sort_order=30),
         Service(name="Бикини глубокое", price=55, duration_min=50, buffer_min=0, is_active=True, sort_order=40),
     ])
-
-def _to_tz(dt_utc: datetime, tz: pytz.BaseTzInfo) -> datetime:
-    if dt_utc.tzinfo is None:
-        dt_utc = pytz.UTC.localize(dt_utc)
+    clear_services_cache()
+
+# Быстрый выход, если момент уже в нужной зоне: asyncpg отдаёт timestamptz
+# с tzinfo=timezone.utc, и такие значения не нужно пересчитывать.
+def _to_tz(dt_utc: datetime, tz: ZoneInfo) -> datetime:
+    tzinfo = dt_utc.tzinfo
+    if tzinfo is tz:
+        return dt_utc
+    if tzinfo is None:
+        dt_utc = dt_utc.replace(tzinfo=_UTC)
     return dt_utc.astimezone(tz)
 
-def _to_utc(dt_local: datetime, tz: pytz.BaseTzInfo) -> datetime:
-    if dt_local.tzinfo is None:
-        dt_local = tz.localize(dt_local)
-    return dt_local.astimezone(pytz.UTC)
+def _to_utc(dt_local: datetime, tz: ZoneInfo) -> datetime:
+    tzinfo = dt_local.tzinfo
+    if tzinfo is _UTC:
+        return dt_local
+    if tzinfo is None:
+        dt_local = dt_local.replace(tzinfo=tz)
+    return dt_local.astimezone(_UTC)
 
 def _round_slot(dt_local: datetime, step_min: int) -> datetime:
     m = (dt_local.minute // step_min) * step_min
@@ -115,16 +232,17 @@ def compute_slot_end_for_duration(
     return start_local + timedelta(minutes=total_min)
 
 async def list_available_dates(session: AsyncSession, settings: SettingsView) -> list[date]:
-    now_local = _to_tz(datetime.now(tz=pytz.UTC), settings.tz)
+    now_local = _to_tz(_now(session), settings.tz)
     start_date = now_local.date()
     end_date = (now_local + timedelta(days=settings.booking_horizon_days)).date()
-    out: list[date] = []
-    d = start_date
-    while d <= end_date:
-        if d.weekday() in settings.work_days:
-            out.append(d)
-        d += timedelta(days=1)
-    return out
+    mask = settings.work_days_mask
+    start_wd = start_date.weekday()
+    start_ord = start_date.toordinal()
+    return [
+        date.fromordinal(start_ord + i)
+        for i in range(end_date.toordinal() - start_ord + 1)
+        if (mask >> ((start_wd + i) % 7)) & 1
+    ]
 
 async def list_available_slots_for_service(
     session: AsyncSession,
@@ -134,65 +252,245 @@ async def list_available_slots_for_service(
 ) -> list[datetime]:
     return await list_available_slots_for_duration(session, settings, service, day, int(service.duration_min))
 
-async def list_available_slots_for_duration(
+# Свободные старты слотов считаются одним запросом: generate_series даёт кандидатов
+# по каждому рабочему окну, NOT EXISTS отсекает пересечения с активными записями и
+# блокировками (пересечение через tstzrange && идёт по GiST-индексам).
+_FREE_SLOTS_SQL = text("""
+    SELECT s.slot_start
+    FROM unnest(:ws, :we) AS w(ws, we)
+    CROSS JOIN LATERAL generate_series(
+        w.ws,
+        w.we - make_interval(mins => :dur),
+        make_interval(mins => :step)
+    ) AS s(slot_start)
+    WHERE s.slot_start >= :earliest
+      AND NOT EXISTS (
+        SELECT 1 FROM appointments a
+        WHERE a.status IN ('Hold', 'Booked')
+          AND tstzrange(a.start_dt, a.end_dt, '[)')
+              && tstzrange(s.slot_start, s.slot_start + make_interval(mins => :dur), '[)')
+      )
+      AND NOT EXISTS (
+        SELECT 1 FROM blocked_intervals b
+        WHERE tstzrange(b.start_dt, b.end_dt, '[)')
+              && tstzrange(s.slot_start, s.slot_start + make_interval(mins => :dur), '[)')
+      )
+    ORDER BY s.slot_start
+""").bindparams(
+    bindparam("ws", type_=ARRAY(DateTime(timezone=True))),
+    bindparam("we", type_=ARRAY(DateTime(timezone=True))),
+    bindparam("earliest", type_=DateTime(timezone=True)),
+    bindparam("dur", type_=Integer),
+    bindparam("step", type_=Integer),
+)
+
+SLOTS_CACHE_TTL_S = 60.0
+SLOTS_CACHE_MAX = 512
+
+# Кэш свободных слотов: (tz, дни, длительность) -> (поколение, момент протухания, слоты).
+# Поколение растёт после каждого commit, менявшего записи или блокировки (см. слушатели
+# ниже), и делает недействительными все записи разом. Инстансов бота может быть
+# несколько (ср. advisory-lock тика в scheduler): такой commit шлёт NOTIFY, и остальные
+# процессы сбрасывают кэш через SlotChangeListener. Пока слушающее соединение
+# переподключается, устаревание всё равно ограничено SLOTS_CACHE_TTL_S.
+_slots_cache: OrderedDict[tuple, tuple[int, float, list[datetime]]] = OrderedDict()
+_slots_generation = 0
+
+def slots_generation() -> int:
+    """Текущее поколение кэша слотов — для внешних кэшей поверх него (см. handlers)."""
+    return _slots_generation
+
+def invalidate_slots_cache() -> None:
+    global _slots_generation
+    _slots_generation += 1
+
+def mark_slots_dirty(session: AsyncSession) -> None:
+    """Для bulk UPDATE/DELETE, которые идут мимо flush: сбросить кэш слотов после commit."""
+    session.info["slots_dirty"] = True
+
+@event.listens_for(BotSession, "after_flush")
+def _track_slot_writes(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (Appointment, BlockedInterval)):
+            session.info["slots_dirty"] = True
+            return
+
+SLOTS_NOTIFY_CHANNEL = "slots_changed"
+_NOTIFY_SLOTS_SQL = text(f"NOTIFY {SLOTS_NOTIFY_CHANNEL}")
+
+@event.listens_for(BotSession, "before_commit")
+def _notify_slot_writes(session: Session) -> None:
+    # flush сам по себе идёт уже после before_commit — сбрасываем раньше,
+    # чтобы _track_slot_writes успел отметить изменения
+    session.flush()
+    if session.info.get("slots_dirty"):
+        # NOTIFY транзакционный: другие процессы получат его ровно в момент commit
+        session.connection().execute(_NOTIFY_SLOTS_SQL)
+
+class SlotChangeListener:
+    """
+    Держит отдельное соединение с LISTEN на SLOTS_NOTIFY_CHANNEL и сбрасывает кэш
+    слотов по каждому уведомлению. При обрыве соединения переподключается в фоне;
+    close() вызывает владелец при остановке бота.
+    """
+
+    RECONNECT_DELAY_S = 5.0
+
+    def __init__(self, engine: AsyncEngine):
+        self._engine = engine
+        self._conn: AsyncConnection | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._closed = False
+
+    async def start(self) -> None:
+        conn = await self._engine.connect()
+        try:
+            raw = await conn.get_raw_connection()
+            driver_conn = raw.driver_connection
+            await driver_conn.add_listener(
+                SLOTS_NOTIFY_CHANNEL, lambda *_: invalidate_slots_cache(),
+            )
+            driver_conn.add_termination_listener(self._on_terminated)
+        except Exception:
+            await conn.close()
+            raise
+        self._conn = conn
+
+    def _on_terminated(self, _driver_conn) -> None:
+        if self._closed:
+            return
+        logger.warning("LISTEN %s connection lost, reconnecting", SLOTS_NOTIFY_CHANNEL)
+        # пока соединения нет, уведомления теряются — сбрасываем кэш сразу
+        invalidate_slots_cache()
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            # мёртвое соединение не должно вернуться в пул
+            await conn.invalidate()
+        while not self._closed:
+            await asyncio.sleep(self.RECONNECT_DELAY_S)
+            try:
+                await self.start()
+            except Exception as exc:
+                logger.warning("LISTEN %s reconnect failed: %s", SLOTS_NOTIFY_CHANNEL, exc)
+                continue
+            # за время обрыва могли пропустить NOTIFY
+            invalidate_slots_cache()
+            logger.info("LISTEN %s connection restored", SLOTS_NOTIFY_CHANNEL)
+            return
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+@event.listens_for(BotSession, "after_commit")
+def _invalidate_slots_after_commit(session: Session) -> None:
+    if session.info.pop("slots_dirty", False):
+        invalidate_slots_cache()
+
+@event.listens_for(BotSession, "after_rollback")
+def _forget_slot_writes(session: Session) -> None:
+    session.info.pop("slots_dirty", None)
+
+@event.listens_for(BotSession, "after_transaction_end")
+def _reset_now(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop("now_utc", None)
+
+async def _free_slot_starts(
     session: AsyncSession,
     settings: SettingsView,
-    service: Service,
-    day: date,
-    duration_min: int,
+    days: list[date],
+    total_min: int,
 ) -> list[datetime]:
-    now_local = _to_tz(datetime.now(tz=pytz.UTC), settings.tz)
+    """Свободные локальные старты слотов длиной total_min по рабочим окнам дней."""
+    if not days:
+        return []
+    now_local = _to_tz(_now(session), settings.tz)
     earliest_local = now_local + timedelta(minutes=settings.min_lead_time_min)
 
-    work_start_local = settings.tz.localize(datetime.combine(day, settings.work_start))
-    work_end_local = settings.tz.localize(datetime.combine(day, settings.work_end))
-
+    # text()-запрос не делает autoflush: без этого перерывы, только что добавленные
+    # _sync_break_rules в этой же сессии, не попали бы в выборку (и в кэш)
+    await session.flush()
+    # свои незакоммиченные изменения записей кэш не видит — в этом случае идём в БД
+    use_cache = not session.info.get("slots_dirty")
+    key = (settings.tz.key, tuple(days), int(total_min))
+    if use_cache:
+        cached = _slots_cache.get(key)
+        if cached is not None and cached[0] == _slots_generation and cached[1] > _time.monotonic():
+            _slots_cache.move_to_end(key)
+            # со временем граница earliest сдвигается — досрезаем закэшированное
+            return [st for st in cached[2] if st >= earliest_local]
+    generation = _slots_generation
     step = settings.slot_step_min
-    cursor = _round_slot(work_start_local, step)
-    slots: list[datetime] = []
-
-    window_start_utc = _to_utc(work_start_local, settings.tz)
-    window_end_utc = _to_utc(work_end_local + timedelta(hours=6), settings.tz)
-
-    appts = (await session.execute(
-        select(Appointment).where(
-            and_(
-                Appointment.start_dt < window_end_utc,
-                Appointment.end_dt > window_start_utc,
-                Appointment.status.in_([AppointmentStatus.Hold, AppointmentStatus.Booked])
-            )
-        )
-    )).scalars().all()
-
-    blocks = (await session.execute(
-        select(BlockedInterval).where(
-            and_(
-                BlockedInterval.start_dt < window_end_utc,
-                BlockedInterval.end_dt > window_start_utc
-            )
-        )
+    tz = settings.tz
+    # то же округление, что и _round_slot: минуты внутри часа вниз до шага
+    start_min = settings.work_start_min - (settings.work_start.minute % step)
+    start_off = timedelta(minutes=start_min)
+    end_off = timedelta(minutes=settings.work_end_min)
+
+    ws: list[datetime] = []
+    we: list[datetime] = []
+    for day in days:
+        midnight = datetime.combine(day, time.min, tzinfo=tz)
+        ws.append(_to_utc(midnight + start_off, tz))
+        we.append(_to_utc(midnight + end_off, tz))
+
+    rows = (await session.execute(
+        _FREE_SLOTS_SQL,
+        {
+            "ws": ws,
+            "we": we,
+            "earliest": _to_utc(earliest_local, settings.tz),
+            "dur": int(total_min),
+            "step": int(step),
+        },
     )).scalars().all()
+    # asyncpg отдаёт timestamptz уже aware (UTC), так что _to_tz с его проверками
+    # не нужен; ZoneInfo.astimezone реализован на C и дешевле ручного сдвига на offset
+    result = [r.astimezone(tz) for r in rows]
+    if use_cache:
+        # поколение взято до запроса: если за это время был commit, запись сразу устарела
+        _slots_cache[key] = (generation, _time.monotonic() + SLOTS_CACHE_TTL_S, result)
+        _slots_cache.move_to_end(key)
+        if len(_slots_cache) > SLOTS_CACHE_MAX:
+            _slots_cache.popitem(last=False)
+    return list(result)
 
-    def overlaps(start_utc: datetime, end_utc: datetime) -> bool:
-        for a in appts:
-            if a.start_dt < end_utc and a.end_dt > start_utc:
-                return True
-        for b in blocks:
-            if b.start_dt < end_utc and b.end_dt > start_utc:
-                return True
-        return False
-
-    while cursor < work_end_local:
-        if cursor >= earliest_local:
-            end_local = compute_slot_end_for_duration(cursor, duration_min, service, settings)
-            if end_local <= work_end_local:
-                s_utc = _to_utc(cursor, settings.tz)
-                e_utc = _to_utc(end_local, settings.tz)
-                if not overlaps(s_utc, e_utc):
-                    slots.append(cursor)
-        cursor += timedelta(minutes=step)
+async def list_available_slots_for_duration(
+    session: AsyncSession,
+    settings: SettingsView,
+    service: Service,
+    day: date,
+    duration_min: int,
+) -> list[datetime]:
+    total_min = int(duration_min) + int(service.buffer_min) + int(settings.buffer_min)
+    return await _free_slot_starts(session, settings, [day], total_min)
 
-    return slots
+async def list_available_slots_for_horizon(
+    session: AsyncSession,
+    settings: SettingsView,
+    service: Service,
+    duration_min: int | None = None,
+) -> dict[date, list[datetime]]:
+    """
+    Свободные слоты по всем рабочим дням горизонта бронирования одним запросом.
+    Ключи — те же даты, что и у list_available_dates (включая дни без слотов).
+    """
+    days = await list_available_dates(session, settings)
+    dur = int(service.duration_min if duration_min is None else duration_min)
+    total = dur + int(service.buffer_min) + int(settings.buffer_min)
+    out: dict[date, list[datetime]] = {d: [] for d in days}
+    for start_local in await _free_slot_starts(session, settings, days, total):
+        out[start_local.date()].append(start_local)
+    return out
 
 async def list_available_break_slots(
     session: AsyncSession,
@@ -200,64 +498,40 @@ async def list_available_break_slots(
     day: date,
     duration_min: int,
 ) -> list[datetime]:
-    now_local = _to_tz(datetime.now(tz=pytz.UTC), settings.tz)
-    earliest_local = now_local + timedelta(minutes=settings.min_lead_time_min)
+    return await _free_slot_starts(session, settings, [day], int(duration_min))
 
-    work_start_local = settings.tz.localize(datetime.combine(day, settings.work_start))
-    work_end_local = settings.tz.localize(datetime.combine(day, settings.work_end))
-
-    step = settings.slot_step_min
-    cursor = _round_slot(work_start_local, step)
-    slots: list[datetime] = []
-
-    window_start_utc = _to_utc(work_start_local, settings.tz)
-    window_end_utc = _to_utc(work_end_local + timedelta(hours=6), settings.tz)
-
-    appts = (await session.execute(
-        select(Appointment).where(
-            and_(
-                Appointment.start_dt < window_end_utc,
-                Appointment.end_dt > window_start_utc,
-                Appointment.status.in_([AppointmentStatus.Hold, AppointmentStatus.Booked])
-            )
-        )
-    )).scalars().all()
-
-    blocks = (await session.execute(
-        select(BlockedInterval).where(
-            and_(
-                BlockedInterval.start_dt < window_end_utc,
-                BlockedInterval.end_dt > window_start_utc
-            )
-        )
-    )).scalars().all()
-
-    def overlaps(start_utc: datetime, end_utc: datetime) -> bool:
-        for a in appts:
-            if a.start_dt < end_utc and a.end_dt > start_utc:
-                return True
-        for b in blocks:
-            if b.start_dt < end_utc and b.end_dt > start_utc:
-                return True
-        return False
-
-    while cursor < work_end_local:
-        if cursor >= earliest_local:
-            end_local = cursor + timedelta(minutes=duration_min)
-            if end_local <= work_end_local:
-                s_utc = _to_utc(cursor, settings.tz)
-                e_utc = _to_utc(end_local, settings.tz)
-                if not overlaps(s_utc, e_utc):
-                    slots.append(cursor)
-        cursor += timedelta(minutes=step)
-
-    return slots
+_ADVISORY_KEY_MASK = (1 << 63) - 1
 
 def _advisory_key_for_slot(start_utc: datetime, service_id: int) -> int:
-    base = f"{int(start_utc.timestamp())}:{service_id}".encode()
-    h = hashlib.sha256(base).digest()
-    key = int.from_bytes(h[:8], byteorder="big", signed=False)
-    return key & ((1 << 63) - 1)
+    """
+    Ключ для pg_advisory_xact_lock. Криптостойкость не нужна: коллизия лишь
+    сериализует две несвязанные брони, поэтому хватает простой арифметики.
+    """
+    return (int(start_utc.timestamp()) * 1000003 ^ service_id) & _ADVISORY_KEY_MASK
+
+_ADVISORY_XACT_LOCK_SQL = text("SELECT pg_advisory_xact_lock(:k)").bindparams(
+    bindparam("k", type_=BigInteger),
+)
+
+# Пересечения проверяются через tstzrange && — под это есть GiST-индексы (см. main.init_db).
+# Обе проверки пересечения одним запросом: 'A' — занято записью, 'B' — блокировкой.
+# Ветки UNION ALL выполняются по порядку, так что SLOT_TAKEN приоритетнее SLOT_BLOCKED.
+_SLOT_CONFLICT_SQL = text("""
+    (SELECT 'A' FROM appointments a
+     WHERE a.status IN ('Hold', 'Booked')
+       AND tstzrange(a.start_dt, a.end_dt, '[)') && tstzrange(:s, :e, '[)')
+       AND a.id IS DISTINCT FROM :excl
+     LIMIT 1)
+    UNION ALL
+    (SELECT 'B' FROM blocked_intervals b
+     WHERE tstzrange(b.start_dt, b.end_dt, '[)') && tstzrange(:s, :e, '[)')
+     LIMIT 1)
+    LIMIT 1
+""").bindparams(
+    bindparam("s", type_=DateTime(timezone=True)),
+    bindparam("e", type_=DateTime(timezone=True)),
+    bindparam("excl", type_=Integer),
+)
 
 async def _ensure_slot_available(
     session: AsyncSession,
@@ -267,32 +541,24 @@ async def _ensure_slot_available(
     *,
     exclude_appt_id: int | None = None,
 ) -> None:
+    """
+    Берёт advisory-lock на слот и проверяет пересечения с записями и блокировками.
+    Замок остаётся отдельным запросом: в READ COMMITTED снимок берётся в начале
+    оператора, и проверка в том же операторе не увидела бы коммиты, дождавшиеся
+    нас на замке.
+    """
     lock_key = _advisory_key_for_slot(start_utc, service_id)
-    await session.execute(text("SELECT pg_advisory_xact_lock(:k)").bindparams(k=lock_key))
-
-    overlap_filters = [
-        Appointment.start_dt < end_utc,
-        Appointment.end_dt > start_utc,
-        Appointment.status.in_([AppointmentStatus.Hold, AppointmentStatus.Booked]),
-    ]
-    if exclude_appt_id is not None:
-        overlap_filters.append(Appointment.id != exclude_appt_id)
+    await session.execute(_ADVISORY_XACT_LOCK_SQL, {"k": lock_key})
+    # text()-запрос не делает autoflush — свои несброшенные изменения сбрасываем сами
+    await session.flush()
 
-    overlap = await session.execute(
-        select(Appointment.id).where(and_(*overlap_filters)).limit(1)
+    conflict = await session.scalar(
+        _SLOT_CONFLICT_SQL,
+        {"s": start_utc, "e": end_utc, "excl": exclude_appt_id},
     )
-    if overlap.first():
+    if conflict == "A":
         raise ValueError("SLOT_TAKEN")
-
-    block_overlap = await session.execute(
-        select(BlockedInterval.id).where(
-            and_(
-                BlockedInterval.start_dt < end_utc,
-                BlockedInterval.end_dt > start_utc
-            )
-        ).limit(1)
-    )
-    if block_overlap.first():
+    if conflict == "B":
         raise ValueError("SLOT_BLOCKED")
 
 async def create_hold_appointment(
@@ -302,8 +568,11 @@ async def create_hold_appointment(
     service: Service,
     start_local: datetime,
     comment: str | None,
+    *,
+    now_utc: datetime | None = None,
 ) -> Appointment:
-    now_utc = datetime.now(tz=pytz.UTC)
+    if now_utc is None:
+        now_utc = _now(session)
     start_utc = _to_utc(start_local, settings.tz)
     end_local = compute_slot_end(start_local, service, settings)
     end_utc = _to_utc(end_local, settings.tz)
@@ -341,8 +610,10 @@ async def create_hold_appointment_with_duration(
     comment: str | None,
     price_override: float | None = None,
     admin_comment: str | None = None,
+    now_utc: datetime | None = None,
 ) -> Appointment:
-    now_utc = datetime.now(tz=pytz.UTC)
+    if now_utc is None:
+        now_utc = _now(session)
     start_utc = _to_utc(start_local, settings.tz)
     end_local = compute_slot_end_for_duration(start_local, duration_min, service, settings)
     end_utc = _to_utc(end_local, settings.tz)
@@ -381,7 +652,7 @@ async def create_admin_appointment(
     client_comment: str | None = None,
     admin_comment: str | None = None,
 ) -> Appointment:
-    now_utc = datetime.now(tz=pytz.UTC)
+    now_utc = _now(session)
     start_utc = _to_utc(start_local, settings.tz)
     end_local = compute_slot_end(start_local, service, settings)
     end_utc = _to_utc(end_local, settings.tz)
@@ -421,7 +692,7 @@ async def create_admin_appointment_with_duration(
     client_comment: str | None = None,
     admin_comment: str | None = None,
 ) -> Appointment:
-    now_utc = datetime.now(tz=pytz.UTC)
+    now_utc = _now(session)
     start_utc = _to_utc(start_local, settings.tz)
     end_local = compute_slot_end_for_duration(start_local, duration_min, service, settings)
     end_utc = _to_utc(end_local, settings.tz)
@@ -481,32 +752,21 @@ async def create_blocked_interval(
     created_by_admin: int,
     reason: str = "Перерыв",
 ) -> BlockedInterval:
-    now_utc = datetime.now(tz=pytz.UTC)
+    now_utc = _now(session)
     start_utc = _to_utc(start_local, settings.tz)
     end_local = start_local + timedelta(minutes=duration_min)
     end_utc = _to_utc(end_local, settings.tz)
 
-    overlap = await session.execute(
-        select(Appointment.id).where(
-            and_(
-                Appointment.start_dt < end_utc,
-                Appointment.end_dt > start_utc,
-                Appointment.status.in_([AppointmentStatus.Hold, AppointmentStatus.Booked])
-            )
-        ).limit(1)
+    # text()-запрос не делает autoflush: блокировки, добавленные раньше в этой же
+    # сессии (цикл generate_breaks_from_rules), иначе не участвовали бы в проверке
+    await session.flush()
+    conflict = await session.scalar(
+        _SLOT_CONFLICT_SQL,
+        {"s": start_utc, "e": end_utc, "excl": None},
     )
-    if overlap.first():
+    if conflict == "A":
         raise ValueError("SLOT_TAKEN")
-
-    block_overlap = await session.execute(
-        select(BlockedInterval.id).where(
-            and_(
-                BlockedInterval.start_dt < end_utc,
-                BlockedInterval.end_dt > start_utc
-            )
-        ).limit(1)
-    )
-    if block_overlap.first():
+    if conflict == "B":
         raise ValueError("SLOT_BLOCKED")
 
     block = BlockedInterval(
@@ -519,10 +779,10 @@ async def create_blocked_interval(
     session.add(block)
     return block
 
-def _candidate_break_start(rule: BreakRule, day: date, tz: pytz.BaseTzInfo) -> datetime:
-    return tz.localize(datetime.combine(day, rule.start_time))
+def _candidate_break_start(rule: BreakRule, day: date, tz: ZoneInfo) -> datetime:
+    return datetime.combine(day, rule.start_time, tzinfo=tz)
 
-def _break_rule_due_dates(rule: BreakRule, *, through_day: date, work_days: set[int]) -> list[date]:
+def _break_rule_due_dates(rule: BreakRule, *, through_day: date, work_days_mask: int) -> list[date]:
     if rule.repeat == "daily":
         step = timedelta(days=1)
     elif rule.repeat == "weekly":
@@ -536,7 +796,7 @@ def _break_rule_due_dates(rule: BreakRule, *, through_day: date, work_days: set[
 
     dates: list[date] = []
     while cursor <= through_day:
-        if cursor.weekday() in work_days:
+        if (work_days_mask >> cursor.weekday()) & 1:
             dates.append(cursor)
         cursor += step
     return dates
@@ -556,7 +816,7 @@ async def create_break_rule(
     created_by_admin: int,
     last_generated_date: date | None = None,
 ) -> BreakRule:
-    now_utc = datetime.now(tz=pytz.UTC)
+    now_utc = _now(session)
     rule = BreakRule(
         repeat=repeat,
         start_time=start_local.timetz().replace(tzinfo=None),
@@ -577,7 +837,7 @@ async def generate_breaks_from_rules(
     *,
     horizon_days: int,
 ) -> tuple[int, int]:
-    now_local = _to_tz(datetime.now(tz=pytz.UTC), settings.tz)
+    now_local = _to_tz(_now(session), settings.tz)
     through_day = (now_local + timedelta(days=horizon_days)).date()
     rules = await list_active_break_rules(session)
     created = 0
@@ -586,10 +846,10 @@ async def generate_breaks_from_rules(
         if rule.repeat not in {"daily", "weekly"}:
             continue
         if rule.repeat == "weekly" and rule.weekday is not None:
-            work_days = settings.work_days | {rule.weekday}
+            work_days_mask = settings.work_days_mask | (1 << rule.weekday)
         else:
-            work_days = settings.work_days
-        candidate_days = _break_rule_due_dates(rule, through_day=through_day, work_days=work_days)
+            work_days_mask = settings.work_days_mask
+        candidate_days = _break_rule_due_dates(rule, through_day=through_day, work_days_mask=work_days_mask)
         for day in candidate_days:
             start_local = _candidate_break_start(rule, day, settings.tz)
             try:
@@ -620,37 +880,14 @@ async def request_reschedule(
 ) -> None:
     if appt.status != AppointmentStatus.Booked:
         raise ValueError("NOT_BOOKED")
-    now_utc = datetime.now(tz=pytz.UTC)
+    now_utc = _now(session)
     start_utc = _to_utc(new_start_local, settings.tz)
     duration_delta = appt.end_dt - appt.start_dt
     end_utc = start_utc + duration_delta
 
-    lock_key = _advisory_key_for_slot(start_utc, appt.service_id)
-    await session.execute(text("SELECT pg_advisory_xact_lock(:k)").bindparams(k=lock_key))
-
-    overlap = await session.execute(
-        select(Appointment.id).where(
-            and_(
-                Appointment.id != appt.id,
-                Appointment.start_dt < end_utc,
-                Appointment.end_dt > start_utc,
-                Appointment.status.in_([AppointmentStatus.Hold, AppointmentStatus.Booked])
-            )
-        ).limit(1)
+    await _ensure_slot_available(
+        session, start_utc, end_utc, appt.service_id, exclude_appt_id=appt.id,
     )
-    if overlap.first():
-        raise ValueError("SLOT_TAKEN")
-
-    block_overlap = await session.execute(
-        select(BlockedInterval.id).where(
-            and_(
-                BlockedInterval.start_dt < end_utc,
-                BlockedInterval.end_dt > start_utc
-            )
-        ).limit(1)
-    )
-    if block_overlap.first():
-        raise ValueError("SLOT_BLOCKED")
 
     appt.proposed_alt_start_dt = start_utc
     appt.updated_at = now_utc
@@ -658,37 +895,14 @@ async def request_reschedule(
 async def confirm_reschedule(session: AsyncSession, settings: SettingsView, appt: Appointment) -> None:
     if appt.status != AppointmentStatus.Booked or not appt.proposed_alt_start_dt:
         return
-    now_utc = datetime.now(tz=pytz.UTC)
+    now_utc = _now(session)
     start_utc = appt.proposed_alt_start_dt
     duration_delta = appt.end_dt - appt.start_dt
     end_utc = start_utc + duration_delta
 
-    lock_key = _advisory_key_for_slot(start_utc, appt.service_id)
-    await session.execute(text("SELECT pg_advisory_xact_lock(:k)").bindparams(k=lock_key))
-
-    overlap = await session.execute(
-        select(Appointment.id).where(
-            and_(
-                Appointment.id != appt.id,
-                Appointment.start_dt < end_utc,
-                Appointment.end_dt > start_utc,
-                Appointment.status.in_([AppointmentStatus.Hold, AppointmentStatus.Booked])
-            )
-        ).limit(1)
-    )
-    if overlap.first():
-        raise ValueError("SLOT_TAKEN")
-
-    block_overlap = await session.execute(
-        select(BlockedInterval.id).where(
-            and_(
-                BlockedInterval.start_dt < end_utc,
-                BlockedInterval.end_dt > start_utc
-            )
-        ).limit(1)
+    await _ensure_slot_available(
+        session, start_utc, end_utc, appt.service_id, exclude_appt_id=appt.id,
     )
-    if block_overlap.first():
-        raise ValueError("SLOT_BLOCKED")
 
     appt.start_dt = start_utc
     appt.end_dt = end_utc
@@ -702,85 +916,117 @@ async def reject_reschedule(session: AsyncSession, appt: Appointment) -> None:
     if not appt.proposed_alt_start_dt:
         return
     appt.proposed_alt_start_dt = None
-    appt.updated_at = datetime.now(tz=pytz.UTC)
+    appt.updated_at = _now(session)
 
-async def get_user_appointments(session: AsyncSession, tg_id: int, limit: int = 10) -> list[Appointment]:
+# Запросы горячих экранов собираются один раз при импорте; значения передаются
+# через bindparam, так что на каждый вызов не строится новый select().
+# Клиент и услуга подтягиваются тем же JOIN, что и фильтр по tg_id: один запрос на экран.
+def _user_appts_base():
+    return (
+        select(Appointment)
+        .join(User, User.id == Appointment.client_user_id)
+        .join(Service, Service.id == Appointment.service_id)
+        .options(
+            contains_eager(Appointment.client),
+            contains_eager(Appointment.service),
+        )
+        .where(User.tg_id == bindparam("tg_id"))
+    )
+
+_USER_UPCOMING_STMT = (
+    _user_appts_base()
+    .where(
+        and_(
+            Appointment.start_dt >= bindparam("now_utc"),
+            or_(
+                Appointment.status == AppointmentStatus.Booked,
+                and_(
+                    Appointment.status == AppointmentStatus.Hold,
+                    Appointment.hold_expires_at.is_not(None),
+                    Appointment.hold_expires_at > bindparam("now_utc"),
+                ),
+            ),
+        )
+    )
+    .order_by(Appointment.start_dt.asc())
+    .limit(bindparam("limit", type_=Integer))
+)
+
+_USER_HISTORY_STMT = (
+    _user_appts_base()
+    .where(
+        and_(
+            Appointment.start_dt < bindparam("now_utc"),
+            Appointment.status != AppointmentStatus.Hold,
+        )
+    )
+    .order_by(Appointment.start_dt.desc())
+    .limit(bindparam("limit", type_=Integer))
+)
+
+async def get_user_appointments(
+    session: AsyncSession,
+    tg_id: int,
+    limit: int = 10,
+    *,
+    now_utc: datetime | None = None,
+) -> list[Appointment]:
     """
     Мои записи (актуальные):
     - только будущие
     - Booked + активные Hold
     - исключаем Rejected/Canceled/Completed
     """
-    u = (await session.execute(select(User).where(User.tg_id == tg_id))).scalar_one()
-    now_utc = datetime.now(tz=pytz.UTC)
+    if now_utc is None:
+        now_utc = _now(session)
 
     return (await session.execute(
-        select(Appointment)
-        .options(
-            selectinload(Appointment.service),
-            selectinload(Appointment.client),
-        )
-        .where(
-            and_(
-                Appointment.client_user_id == u.id,
-                Appointment.start_dt >= now_utc,
-                or_(
-                    Appointment.status == AppointmentStatus.Booked,
-                    and_(
-                        Appointment.status == AppointmentStatus.Hold,
-                        Appointment.hold_expires_at.is_not(None),
-                        Appointment.hold_expires_at > now_utc,
-                    ),
-                ),
-            )
-        )
-        .order_by(Appointment.start_dt.asc())
-        .limit(limit)
+        _USER_UPCOMING_STMT,
+        {"tg_id": tg_id, "now_utc": now_utc, "limit": limit},
     )).scalars().all()
 
 
-async def get_user_appointments_history(session: AsyncSession, tg_id: int, limit: int = 10) -> list[Appointment]:
+async def get_user_appointments_history(
+    session: AsyncSession,
+    tg_id: int,
+    limit: int = 10,
+    *,
+    now_utc: datetime | None = None,
+) -> list[Appointment]:
     """
     История:
     - прошедшие записи (start_dt < now)
     - без Hold (они либо сгорели/подтвердились, либо не нужны в истории)
     """
-    u = (await session.execute(select(User).where(User.tg_id == tg_id))).scalar_one()
-    now_utc = datetime.now(tz=pytz.UTC)
+    if now_utc is None:
+        now_utc = _now(session)
 
     return (await session.execute(
-        select(Appointment)
-        .options(
-            selectinload(Appointment.service),
-            selectinload(Appointment.client),
-        )
-        .where(
-            and_(
-                Appointment.client_user_id == u.id,
-                Appointment.start_dt < now_utc,
-                Appointment.status != AppointmentStatus.Hold,
-            )
-        )
-        .order_by(Appointment.start_dt.desc())
-        .limit(limit)
+        _USER_HISTORY_STMT,
+        {"tg_id": tg_id, "now_utc": now_utc, "limit": limit},
     )).scalars().all()
 
+# услуга и клиент тем же запросом (JOIN + contains_eager), а не двумя selectinload
+_APPT_BY_ID_STMT = (
+    select(Appointment)
+    .join(Service, Service.id == Appointment.service_id)
+    .join(User, User.id == Appointment.client_user_id)
+    .options(
+        contains_eager(Appointment.service),
+        contains_eager(Appointment.client),
+    )
+    .where(Appointment.id == bindparam("appt_id"))
+)
+
 async def get_appointment(session: AsyncSession, appt_id: int) -> Appointment:
-    return (await session.execute(
-        select(Appointment)
-        .options(
-            selectinload(Appointment.service),
-            selectinload(Appointment.client),
-        )
-        .where(Appointment.id == appt_id)
-    )).scalar_one()
+    return (await session.execute(_APPT_BY_ID_STMT, {"appt_id": appt_id})).scalar_one()
 
 async def admin_confirm(session: AsyncSession, appt: Appointment) -> None:
     if appt.status != AppointmentStatus.Hold:
         return
     appt.status = AppointmentStatus.Booked
     appt.hold_expires_at = None
-    appt.updated_at = datetime.now(tz=pytz.UTC)
+    appt.updated_at = _now(session)
 
 async def admin_reject(session: AsyncSession, appt: Appointment, reason: str | None = None) -> None:
     if appt.status not in (AppointmentStatus.Hold, AppointmentStatus.Booked):
@@ -788,12 +1034,19 @@ async def admin_reject(session: AsyncSession, appt: Appointment, reason: str | N
     appt.status = AppointmentStatus.Rejected
     appt.admin_comment = reason
     appt.hold_expires_at = None
-    appt.updated_at = datetime.now(tz=pytz.UTC)
+    appt.updated_at = _now(session)
 
-async def cancel_by_client(session: AsyncSession, settings: SettingsView, appt: Appointment) -> bool:
+async def cancel_by_client(
+    session: AsyncSession,
+    settings: SettingsView,
+    appt: Appointment,
+    *,
+    now_utc: datetime | None = None,
+) -> bool:
     if appt.status != AppointmentStatus.Booked:
         return False
-    now_utc = datetime.now(tz=pytz.UTC)
+    if now_utc is None:
+        now_utc = _now(session)
     limit = appt.start_dt - timedelta(hours=settings.cancel_limit_hours)
     if now_utc > limit:
         return False
@@ -805,7 +1058,7 @@ async def admin_cancel_appointment(session: AsyncSession, appt: Appointment) ->
     if appt.status != AppointmentStatus.Booked:
         return False
     appt.status = AppointmentStatus.Canceled
-    appt.updated_at = datetime.now(tz=pytz.UTC)
+    appt.updated_at = _now(session)
     return True
 
 async def admin_reschedule_appointment(
@@ -817,67 +1070,105 @@ async def admin_reschedule_appointment(
     await request_reschedule(session, settings, appt, new_start_local)
     await confirm_reschedule(session, settings, appt)
 
-async def admin_list_appointments_for_day(session: AsyncSession, tz: pytz.BaseTzInfo, day: date) -> list[Appointment]:
-    start_local = tz.localize(datetime.combine(day, datetime.min.time()))
-    end_local = start_local + timedelta(days=1)
-    start_utc = start_local.astimezone(pytz.UTC)
-    end_utc = end_local.astimezone(pytz.UTC)
+def day_bounds_utc(day: date, tz: ZoneInfo) -> tuple[datetime, datetime]:
+    """UTC-границы локальных суток [00:00, 24:00)."""
+    start_local = datetime.combine(day, time.min, tzinfo=tz)
+    end_local = datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+    return _to_utc(start_local, tz), _to_utc(end_local, tz)
 
+def _admin_appt_rows():
+    """
+    Плоская выборка для админских списков: только поля, которые нужны для отображения,
+    одним JOIN вместо Appointment + selectinload(client/service).
+    """
+    return (
+        select(
+            Appointment.id,
+            Appointment.service_id,
+            Appointment.client_user_id,
+            Appointment.start_dt,
+            Appointment.end_dt,
+            Appointment.status,
+            Appointment.hold_expires_at,
+            Appointment.price_override,
+            Appointment.admin_comment,
+            Service.name.label("service_name"),
+            Service.price.label("service_price"),
+            User.full_name.label("client_full_name"),
+            User.username.label("client_username"),
+            User.tg_id.label("client_tg_id"),
+            User.phone.label("client_phone"),
+        )
+        .join(Service, Service.id == Appointment.service_id)
+        .join(User, User.id == Appointment.client_user_id)
+    )
+
+_ADMIN_DAY_STMT = (
+    _admin_appt_rows()
+    .where(and_(
+        Appointment.start_dt >= bindparam("start_utc"),
+        Appointment.start_dt < bindparam("end_utc"),
+        status_is(AppointmentStatus.Hold, AppointmentStatus.Booked),
+    ))
+    .order_by(Appointment.start_dt.asc())
+)
+
+_ADMIN_HOLDS_STMT = (
+    _admin_appt_rows()
+    .where(status_is(AppointmentStatus.Hold))
+    .order_by(Appointment.hold_expires_at.asc())
+)
+
+_ADMIN_BOOKED_RANGE_STMT = (
+    _admin_appt_rows()
+    .where(and_(
+        Appointment.start_dt >= bindparam("start_utc"),
+        Appointment.start_dt < bindparam("end_utc"),
+        status_is(AppointmentStatus.Booked),
+    ))
+    .order_by(Appointment.start_dt.asc())
+)
+
+_FUTURE_BREAKS_STMT = (
+    select(BlockedInterval)
+    .where(and_(
+        BlockedInterval.end_dt >= bindparam("start_utc"),
+        BlockedInterval.start_dt < bindparam("end_utc"),
+    ))
+    .order_by(BlockedInterval.start_dt.asc())
+)
+
+async def admin_list_appointments_for_day(session: AsyncSession, tz: ZoneInfo, day: date) -> list[Row]:
+    start_utc, end_utc = day_bounds_utc(day, tz)
     return (await session.execute(
-        select(Appointment)
-        .options(selectinload(Appointment.client), selectinload(Appointment.service))
-        .where(and_(
-            Appointment.start_dt >= start_utc,
-            Appointment.start_dt < end_utc,
-            Appointment.status.in_([AppointmentStatus.Booked, AppointmentStatus.Hold]),
-        ))
-        .order_by(Appointment.start_dt.asc())
-    )).scalars().all()
+        _ADMIN_DAY_STMT,
+        {"start_utc": start_utc, "end_utc": end_utc},
+    )).all()
 
 
-async def admin_list_holds(session: AsyncSession) -> list[Appointment]:
-    return (await session.execute(
-        select(Appointment)
-        .options(selectinload(Appointment.client), selectinload(Appointment.service))
-        .where(Appointment.status == AppointmentStatus.Hold)
-        .order_by(Appointment.hold_expires_at.asc())
-    )).scalars().all()
+async def admin_list_holds(session: AsyncSession) -> list[Row]:
+    return (await session.execute(_ADMIN_HOLDS_STMT)).all()
 
 async def admin_list_booked_range(
     session: AsyncSession,
     start_utc: datetime,
     end_utc: datetime,
-) -> list[Appointment]:
+) -> list[Row]:
     return (await session.execute(
-        select(Appointment)
-        .options(selectinload(Appointment.client), selectinload(Appointment.service))
-        .where(
-            and_(
-                Appointment.start_dt >= start_utc,
-                Appointment.start_dt < end_utc,
-                Appointment.status == AppointmentStatus.Booked,
-            )
-        )
-        .order_by(Appointment.start_dt.asc())
-    )).scalars().all()
+        _ADMIN_BOOKED_RANGE_STMT,
+        {"start_utc": start_utc, "end_utc": end_utc},
+    )).all()
 
 async def admin_list_appointments_range(
     session: AsyncSession,
     start_utc: datetime,
     end_utc: datetime,
-) -> list[Appointment]:
+) -> list[Row]:
+    # тот же фильтр, что и у дня, только границы шире
     return (await session.execute(
-        select(Appointment)
-        .options(selectinload(Appointment.client), selectinload(Appointment.service))
-        .where(
-            and_(
-                Appointment.start_dt >= start_utc,
-                Appointment.start_dt < end_utc,
-                Appointment.status.in_([AppointmentStatus.Booked, AppointmentStatus.Hold]),
-            )
-        )
-        .order_by(Appointment.start_dt.asc())
-    )).scalars().all()
+        _ADMIN_DAY_STMT,
+        {"start_utc": start_utc, "end_utc": end_utc},
+    )).all()
 
 async def list_future_breaks(
     session: AsyncSession,
@@ -885,20 +1176,12 @@ async def list_future_breaks(
     end_utc: datetime,
 ) -> list[BlockedInterval]:
     return (await session.execute(
-        select(BlockedInterval)
-        .where(
-            and_(
-                BlockedInterval.end_dt >= start_utc,
-                BlockedInterval.start_dt < end_utc,
-            )
-        )
-        .order_by(BlockedInterval.start_dt.asc())
+        _FUTURE_BREAKS_STMT,
+        {"start_utc": start_utc, "end_utc": end_utc},
     )).scalars().all()
 
 async def delete_blocked_interval(session: AsyncSession, block_id: int) -> bool:
-    block = (await session.execute(
-        select(BlockedInterval).where(BlockedInterval.id == block_id)
-    )).scalar_one_or_none()
+    block = await session.get(BlockedInterval, block_id)
     if not block:
         return False
     await session.delete(block)
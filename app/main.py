@@ -1,17 +1,19 @@
 from datetime import time as dt_time
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
-import pytz
 from sqlalchemy import select, text
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 
 from app.config import load_config
 from app.db import make_engine, make_session_factory
 from app.models import Base, Setting
-from app.logic import seed_defaults_if_needed, ensure_default_services
+from app.logic import (
+    seed_defaults_if_needed, ensure_default_services, clear_settings_cache, clear_services_cache,
+    SlotChangeListener,
+)
 from app.handlers import cmd_start, cb_router, handle_contact, unified_text_router
-from app.scheduler import tick
+from app.scheduler import periodic_tick
 from app.reminders import (
-    check_and_send_reminders,
     send_daily_admin_schedule,
     send_daily_admin_earnings_report,
     send_weekly_admin_earnings_report,
@@ -23,15 +25,51 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
+# Индексы, которых нет в моделях: create_all не трогает уже существующие таблицы.
+# GiST по tstzrange обслуживает проверки пересечения интервалов (оператор &&).
+_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_appointments_active_range ON appointments "
+    "USING gist (tstzrange(start_dt, end_dt, '[)')) WHERE status IN ('Hold', 'Booked')",
+    "CREATE INDEX IF NOT EXISTS ix_blocked_intervals_range ON blocked_intervals "
+    "USING gist (tstzrange(start_dt, end_dt, '[)'))",
+    # «Мои записи»/история: клиент + диапазон start_dt, статус и hold_expires_at без похода в heap
+    "CREATE INDEX IF NOT EXISTS ix_appointments_client_start ON appointments "
+    "(client_user_id, start_dt) INCLUDE (status, hold_expires_at)",
+    # admin_list_holds: только Hold, упорядочены по hold_expires_at
+    "CREATE INDEX IF NOT EXISTS ix_appointments_hold_expires ON appointments "
+    "(hold_expires_at) WHERE status = 'Hold'",
+    # admin_list_appointments_for_day: активные записи по диапазону start_dt
+    "CREATE INDEX IF NOT EXISTS ix_appointments_active_start ON appointments "
+    "(start_dt) WHERE status IN ('Hold', 'Booked')",
+    # минутный тик: ещё не отправленные напоминания за 48 ч и за 2 ч
+    "CREATE INDEX IF NOT EXISTS ix_appointments_rem48 ON appointments "
+    "(start_dt) WHERE status = 'Booked' AND reminder_24h_sent = false",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_rem2 ON appointments "
+    "(start_dt) WHERE status = 'Booked' AND reminder_2h_sent = false",
+    # минутный тик: завершённые, но ещё не закрытые визиты
+    "CREATE INDEX IF NOT EXISTS ix_appointments_aftercare ON appointments "
+    "(end_dt) WHERE status = 'Booked'",
+)
+
+
 async def init_db(engine):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
         try:
-            await conn.execute(
-                text("ALTER TABLE appointments ADD COLUMN IF NOT EXISTS price_override NUMERIC(10, 2)")
-            )
+            async with conn.begin_nested():
+                await conn.execute(
+                    text("ALTER TABLE appointments ADD COLUMN IF NOT EXISTS price_override NUMERIC(10, 2)")
+                )
         except Exception as exc:
             logger.warning("Failed to ensure price_override column exists: %s", exc)
+        for ddl in _INDEX_DDL:
+            # каждый индекс в своём SAVEPOINT: ошибка одного CREATE INDEX иначе
+            # оборвала бы всю транзакцию вместе с create_all выше
+            try:
+                async with conn.begin_nested():
+                    await conn.execute(text(ddl))
+            except Exception as exc:
+                logger.warning("Failed to ensure index (%s): %s", ddl, exc)
 
 
 async def seed_db(session_factory, cfg):
@@ -66,6 +104,9 @@ async def seed_db(session_factory, cfg):
                     setting.value = value
                 else:
                     s.add(Setting(key=key, value=value))
+    # настройки и услуги могли измениться — сбрасываем кэши процесса
+    clear_settings_cache()
+    clear_services_cache()
 
 
 def main():
@@ -78,8 +119,27 @@ def main():
     async def post_init(app: Application):
         await init_db(engine)
         await seed_db(session_factory, cfg)
-
-    app = Application.builder().token(cfg.bot_token).post_init(post_init).build()
+        # кэш слотов сбрасывается и по commit'ам других инстансов бота
+        try:
+            listener = SlotChangeListener(engine)
+            await listener.start()
+            app.bot_data["slots_listener"] = listener
+        except Exception as exc:
+            logger.warning("Failed to LISTEN for slot changes: %s", exc)
+
+    async def post_shutdown(app: Application):
+        listener = app.bot_data.pop("slots_listener", None)
+        if listener is not None:
+            await listener.close()
+        await engine.dispose()
+
+    app = (
+        Application.builder()
+        .token(cfg.bot_token)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # shared objects for handlers/jobs
     app.bot_data["cfg"] = cfg
@@ -93,22 +153,13 @@ def main():
     app.add_handler(MessageHandler(filters.CONTACT, handle_contact))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, unified_text_router))
 
-    # periodic jobs (every 60s)
-    async def tick_job(ctx):
-        await tick(ctx.application)
-
-    # было (и падает):
-# app.job_queue.run_repeating(tick_job, interval=60, first=10)
-
-    # стало:
     if app.job_queue is None:
         logger.warning('JobQueue is None. Install: python-telegram-bot[job-queue]')
     else:
-        app.job_queue.run_repeating(tick_job, interval=60, first=10)
-        # reminders: booking reminders (checked every 60s)
-        app.job_queue.run_repeating(check_and_send_reminders, interval=60, first=20)
+        # periodic job (every 60s): expired holds + booking reminders + finished visits
+        app.job_queue.run_repeating(periodic_tick, interval=60, first=10)
         tz_name = app.bot_data.get("tz", "Europe/Moscow")
-        tz = pytz.timezone(tz_name)
+        tz = ZoneInfo(tz_name)
         app.job_queue.run_daily(send_daily_admin_schedule, time=dt_time(hour=8, minute=0, tzinfo=tz))
         app.job_queue.run_daily(send_daily_admin_earnings_report, time=dt_time(hour=21, minute=0, tzinfo=tz))
         app.job_queue.run_daily(send_weekly_admin_earnings_report, time=dt_time(hour=21, minute=0, tzinfo=tz))
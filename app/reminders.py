@@ -1,16 +1,20 @@
 from __future__ import annotations
 
-from datetime import datetime, time as dt_time, timedelta, timezone
+import asyncio
+from datetime import date, datetime, time as dt_time, timedelta, timezone, tzinfo
 from decimal import Decimal
+from functools import lru_cache
+from zoneinfo import ZoneInfo
 
+from telegram.error import BadRequest, Forbidden, RetryAfter, TimedOut
 from telegram.ext import ContextTypes
-from sqlalchemy import select, update
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, case, and_, or_, false
+from sqlalchemy.orm import selectinload, raiseload, contains_eager
 
 from app.models import Appointment, AppointmentStatus, User, Service
-from app.logic import get_settings
+from app.logic import get_settings, status_is
 from app.keyboards import reminder_kb, admin_visit_confirm_kb
-from app.utils import format_price, appointment_services_label
+from app.utils import format_price, appointment_services_label, client_label_for, services_label_for
 from texts import AFTERCARE_RECOMMENDATIONS_PARTS
 
 
@@ -41,25 +45,132 @@ REMINDER_2H_TEMPLATE = (
 )
 
 
-def _utcnow() -> datetime:
-    return datetime.now(timezone.utc)
+@lru_cache(maxsize=1024)
+def _reminder_48h_text(service: str, date: str, time: str) -> str:
+    return REMINDER_48H_TEMPLATE.format(service=service, date=date, time=time)
 
 
-def _fmt_date(dt: datetime, tz_name: str) -> tuple[str, str]:
-    # dt в БД timezone-aware; переводим в tz бота (чтобы клиент видел локальное время)
+@lru_cache(maxsize=1024)
+def _reminder_2h_text(service: str, time: str) -> str:
+    return REMINDER_2H_TEMPLATE.format(service=service, time=time)
+
+
+def _pack_parts(parts: list[str], limit: int = 4000) -> list[str]:
+    """
+    Склеивает части подряд через пустую строку, пока сообщение не длиннее limit
+    (у Telegram предел 4096 символов). Часть длиннее limit уходит отдельно как есть.
+    """
+    messages: list[str] = []
+    current = ""
+    for part in parts:
+        candidate = f"{current}\n\n{part}" if current else part
+        if current and len(candidate) > limit:
+            messages.append(current)
+            current = part
+        else:
+            current = candidate
+    if current:
+        messages.append(current)
+    return messages
+
+
+# рекомендации после визита — 1–2 сообщения вместо отдельного на каждую часть
+AFTERCARE_MESSAGES = _pack_parts(AFTERCARE_RECOMMENDATIONS_PARTS)
+
+
+# Рекомендации клиенту уходят, только если визит закончился не раньше этого окна:
+# после долгого простоя бота визит всё равно завершается и админ получает запрос
+# цены, но клиенту не пишем про давно прошедшую процедуру.
+AFTERCARE_WINDOW = timedelta(minutes=15)
+
+# Глубина выборки завершённых визитов. Всё, что старше, закрывается одним UPDATE
+# без сообщений — иначе недоставленные запросы цены копились бы бесконечно.
+VISIT_COMPLETE_LOOKBACK = timedelta(days=7)
+
+# Запросы цены в один админский чат идут раз в секунду (_send_to_chat), поэтому
+# визиты берутся порциями: тик укладывается в минутный интервал, остаток — на следующий.
+AFTERCARE_BATCH = 20
+
+
+# Одновременных send_message не больше 28 — запас под глобальный лимит Telegram ~30 msg/s.
+_SEND_SEMAPHORE = asyncio.Semaphore(28)
+
+
+async def _send(bot, **kwargs) -> bool | None:
+    """
+    send_message под общим семафором; ошибка одной отправки не валит джоб.
+    На 429 (RetryAfter) и таймаут — одна повторная попытка после паузы.
+    Пауза идёт внутри семафора, чтобы остальные отправки тоже притормозили.
+
+    True — доставлено, False — временная ошибка (можно повторить на следующем тике),
+    None — чат недоступен насовсем (бот заблокирован, чата нет): повтор бесполезен.
+    """
+    async with _SEND_SEMAPHORE:
+        try:
+            await bot.send_message(**kwargs)
+            return True
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            delay = retry_after.total_seconds() if isinstance(retry_after, timedelta) else retry_after
+            await asyncio.sleep(delay + 0.1)
+        except TimedOut:
+            await asyncio.sleep(1)
+        except (Forbidden, BadRequest):
+            return None
+        except Exception:
+            return False
+        try:
+            await bot.send_message(**kwargs)
+            return True
+        except (Forbidden, BadRequest):
+            return None
+        except Exception:
+            return False
+
+
+# Telegram ограничивает и отдельный чат (~1 сообщение в секунду), семафор выше
+# этого не учитывает — сообщения в один чат разводим паузой.
+_CHAT_SEND_INTERVAL_S = 1.0
+
+
+async def _send_to_chat(
+    bot, chat_id: int, messages: list[dict], *, stop_on_error: bool = False,
+) -> list[bool | None]:
+    """
+    Отправляет messages (kwargs для send_message без chat_id) в один чат по очереди.
+    Возвращает результат _send по каждому сообщению; при stop_on_error список
+    обрывается на первой неудаче.
+    """
+    results: list[bool | None] = []
+    for i, kwargs in enumerate(messages):
+        if i:
+            await asyncio.sleep(_CHAT_SEND_INTERVAL_S)
+        ok = await _send(bot, chat_id=chat_id, **kwargs)
+        results.append(ok)
+        if not ok and stop_on_error:
+            break
+    return results
+
+
+@lru_cache(maxsize=32)
+def _get_tz(tz_name: str) -> tzinfo:
     try:
-        import pytz
-        tz = pytz.timezone(tz_name)
-        local = dt.astimezone(tz)
+        return ZoneInfo(tz_name)
     except Exception:
-        local = dt
-    return f"{weekday_ru_full(local)}, {local.strftime('%d.%m.%Y')}", local.strftime('%H:%M')
+        return timezone.utc
+
+
+def _date_label(d: date) -> str:
+    return f"{d.day:02d}.{d.month:02d}.{d.year}"
 
 
-def _localize(dt: datetime, tz) -> datetime:
-    if hasattr(tz, "localize"):
-        return tz.localize(dt)
-    return dt.replace(tzinfo=tz)
+def _fmt_date(dt: datetime, tz: tzinfo) -> tuple[str, str]:
+    # dt в БД timezone-aware; переводим в tz бота (чтобы клиент видел локальное время)
+    local = dt.astimezone(tz)
+    return (
+        f"{WEEKDAY_RU_FULL[local.weekday()]}, {_date_label(local)}",
+        f"{local.hour:02d}:{local.minute:02d}",
+    )
 
 
 def _format_hours(total_hours: float) -> str:
@@ -99,14 +210,14 @@ async def _send_earnings_report(
     async with session_factory() as session:
         q = (
             select(Appointment)
-            .options(selectinload(Appointment.service))
+            .options(selectinload(Appointment.service), raiseload("*"))
             .where(Appointment.visit_confirmed.is_(True))
             .where(Appointment.start_dt >= start_utc)
             .where(Appointment.start_dt < end_utc)
             .order_by(Appointment.start_dt.asc())
         )
         res = await session.execute(q)
-        appts = list(res.scalars().all())
+        appts = res.scalars().all()
 
     if not appts:
         text = f"{title}\nПодтверждённых записей нет."
@@ -132,23 +243,19 @@ async def _send_earnings_report(
             continue
 
 
-async def check_and_send_reminders(context: ContextTypes.DEFAULT_TYPE) -> None:
+async def send_booking_reminders(context: ContextTypes.DEFAULT_TYPE, session_factory, now: datetime) -> None:
     """
-    Запускается JobQueue раз в минуту.
     Шлём:
       - за 48 часов (флаг reminder_24h_sent используем как "первое напоминание")
       - за 2 часа   (флаг reminder_2h_sent используем как "второе напоминание")
-    Только для AppointmentStatus.Booked.
+    Только для AppointmentStatus.Booked. Оба окна выбираются одним запросом
+    (клиент и услуга — через JOIN в той же выборке), колонка kind говорит,
+    какое напоминание должно уйти. Сессия выборки закрывается до отправки,
+    флаги ставятся отдельной короткой сессией после неё.
     """
     app = context.application
-    session_factory = app.bot_data.get("session_factory")
-    if session_factory is None:
-        # если у тебя session_factory хранится иначе — скажи, поменяю
-        return
-    cfg = app.bot_data.get("cfg")
-
     tz_name = app.bot_data.get("tz", "Europe/Moscow")
-    now = _utcnow()
+    tz = _get_tz(tz_name)
 
     # Окна под отправку (чтобы не ловить погрешности по минутам)
     # 48 часов: попадаем в окно [48h, 48h+2min)
@@ -161,145 +268,176 @@ async def check_and_send_reminders(context: ContextTypes.DEFAULT_TYPE) -> None:
     target_2_from = now + timedelta(hours=2)
     target_2_to = target_2_from + win
 
+    # Одна выборка вместо UNION ALL двух: окна не пересекаются, так что kind
+    # однозначно определяется по start_dt, а OR двух веток Postgres сводит
+    # в BitmapOr по частичным индексам напоминаний.
+    # Условия буквально совпадают с предикатами частичных индексов ix_appointments_rem48/
+    # rem2 (status_is даёт литерал, флаги — через = false, а не IS false).
+    kind = case((Appointment.start_dt >= target_48_from, "48h"), else_="2h").label("kind")
+    q = (
+        select(Appointment, kind)
+        .join(Appointment.client)
+        .join(Appointment.service)
+        .options(contains_eager(Appointment.client), contains_eager(Appointment.service), raiseload("*"))
+        .where(status_is(AppointmentStatus.Booked))
+        .where(or_(
+            and_(
+                Appointment.reminder_24h_sent == false(),   # используем как "48h не отправляли"
+                Appointment.start_dt >= target_48_from,
+                Appointment.start_dt < target_48_to,
+            ),
+            and_(
+                Appointment.reminder_2h_sent == false(),    # используем как "2h не отправляли"
+                Appointment.start_dt >= target_2_from,
+                Appointment.start_dt < target_2_to,
+            ),
+        ))
+        .order_by(Appointment.start_dt.asc())
+    )
     async with session_factory() as session:
         settings = await get_settings(session, tz_name)
-        # --- 48h reminders ---
-        q48 = (
-            select(Appointment)
-            .options(selectinload(Appointment.client), selectinload(Appointment.service))
-            .where(Appointment.status == AppointmentStatus.Booked)
-            .where(Appointment.reminder_24h_sent.is_(False))   # используем как "48h не отправляли"
-            .where(Appointment.start_dt >= target_48_from)
-            .where(Appointment.start_dt < target_48_to)
-        )
-        res48 = await session.execute(q48)
-        appts48 = list(res48.scalars().all())
-
-        for appt in appts48:
-            if not appt.client or not appt.client.tg_id:
-                continue
-
-            d, t = _fmt_date(appt.start_dt, tz_name)
-            allow_reschedule = now <= (appt.start_dt - timedelta(hours=settings.cancel_limit_hours))
-            text = REMINDER_48H_TEMPLATE.format(
-                service=appointment_services_label(appt),
-                date=d,
-                time=t,
-            )
+        rows = (await session.execute(q)).all()
 
-            try:
-                await context.bot.send_message(
-                    chat_id=appt.client.tg_id,
-                    text=text,
-                    parse_mode="Markdown",
-                    reply_markup=reminder_kb(appt.id, allow_reschedule=allow_reschedule),
-                )
-                # помечаем как отправленное
-                await session.execute(
-                    update(Appointment)
-                    .where(Appointment.id == appt.id)
-                    .values(reminder_24h_sent=True, updated_at=_utcnow())
-                )
-            except Exception:
-                # не валим весь джоб из-за 1 ошибки
-                continue
-
-        # --- 2h reminders ---
-        q2 = (
-            select(Appointment)
-            .options(selectinload(Appointment.client), selectinload(Appointment.service))
-            .where(Appointment.status == AppointmentStatus.Booked)
-            .where(Appointment.reminder_2h_sent.is_(False))   # используем как "2h не отправляли"
-            .where(Appointment.start_dt >= target_2_from)
-            .where(Appointment.start_dt < target_2_to)
-        )
-        res2 = await session.execute(q2)
-        appts2 = list(res2.scalars().all())
-
-        for appt in appts2:
-            if not appt.client or not appt.client.tg_id:
-                continue
-
-            d, t = _fmt_date(appt.start_dt, tz_name)
-            allow_reschedule = now <= (appt.start_dt - timedelta(hours=settings.cancel_limit_hours))
-            text = REMINDER_2H_TEMPLATE.format(
-                service=appointment_services_label(appt),
-                time=t,
-            )
+    # отправляем параллельно, флаги ставим одним UPDATE на вид напоминания
+    batch: list[tuple[int, str, dict]] = []
+    for appt, appt_kind in rows:
+        if not appt.client or not appt.client.tg_id:
+            continue
 
-            try:
-                await context.bot.send_message(
-                    chat_id=appt.client.tg_id,
-                    text=text,
-                    parse_mode="Markdown",
-                    reply_markup=reminder_kb(appt.id, allow_reschedule=allow_reschedule),
-                )
-                await session.execute(
-                    update(Appointment)
-                    .where(Appointment.id == appt.id)
-                    .values(reminder_2h_sent=True, updated_at=_utcnow())
-                )
-            except Exception:
-                continue
+        d, t = _fmt_date(appt.start_dt, tz)
+        allow_reschedule = now <= (appt.start_dt - timedelta(hours=settings.cancel_limit_hours))
+        if appt_kind == "48h":
+            text = _reminder_48h_text(appointment_services_label(appt), d, t)
+        else:
+            text = _reminder_2h_text(appointment_services_label(appt), t)
+        batch.append((
+            appt.id,
+            appt_kind,
+            dict(
+                chat_id=appt.client.tg_id,
+                text=text,
+                parse_mode="Markdown",
+                reply_markup=reminder_kb(appt.id, allow_reschedule=allow_reschedule),
+            ),
+        ))
+
+    if not batch:
+        return
 
+    results = await asyncio.gather(*(_send(context.bot, **kwargs) for _, _, kwargs in batch))
+    sent_48_ids = [appt_id for (appt_id, k, _), ok in zip(batch, results) if ok and k == "48h"]
+    sent_2_ids = [appt_id for (appt_id, k, _), ok in zip(batch, results) if ok and k != "48h"]
+    if not sent_48_ids and not sent_2_ids:
+        return
+
+    async with session_factory() as session:
+        if sent_48_ids:
+            await session.execute(
+                update(Appointment)
+                .where(Appointment.id.in_(sent_48_ids))
+                .values(reminder_24h_sent=True, updated_at=now)
+            )
+        if sent_2_ids:
+            await session.execute(
+                update(Appointment)
+                .where(Appointment.id.in_(sent_2_ids))
+                .values(reminder_2h_sent=True, updated_at=now)
+            )
         await session.commit()
 
-    # После commit можно отправить пост-уходовые рекомендации
+
+async def complete_finished_visits(context: ContextTypes.DEFAULT_TYPE, session_factory, now: datetime) -> None:
+    """
+    Завершённые визиты: запрос финальной цены админу, рекомендации клиенту,
+    статус Completed. Как и в напоминаниях, отправка идёт вне транзакции,
+    а статус коммитится отдельно после неё. Визиты старше VISIT_COMPLETE_LOOKBACK
+    закрываются без сообщений; за тик обрабатывается не больше AFTERCARE_BATCH визитов.
+    """
+    app = context.application
+    cfg = app.bot_data.get("cfg")
+    tz = _get_tz(app.bot_data.get("tz", "Europe/Moscow"))
+    lookback_from = now - VISIT_COMPLETE_LOOKBACK
+    q_aftercare = (
+        select(Appointment)
+        .join(Appointment.client)
+        .join(Appointment.service)
+        .options(contains_eager(Appointment.client), contains_eager(Appointment.service), raiseload("*"))
+        .where(status_is(AppointmentStatus.Booked))
+        .where(Appointment.end_dt > lookback_from)
+        .where(Appointment.end_dt <= now)
+        .order_by(Appointment.end_dt.asc())
+        .limit(AFTERCARE_BATCH)
+    )
     async with session_factory() as session:
-        q_aftercare = (
-            select(Appointment)
-            .options(selectinload(Appointment.client), selectinload(Appointment.service))
-            .where(Appointment.status == AppointmentStatus.Booked)
-            .where(Appointment.end_dt <= now)
+        await session.execute(
+            update(Appointment)
+            .where(status_is(AppointmentStatus.Booked))
+            .where(Appointment.end_dt <= lookback_from)
+            .values(status=AppointmentStatus.Completed, updated_at=now)
         )
-        res_aftercare = await session.execute(q_aftercare)
-        appts_aftercare = list(res_aftercare.scalars().all())
-
-        for appt in appts_aftercare:
-            admin_ids = _admin_ids(cfg)
-            if admin_ids:
-                date_label, time_label = _fmt_date(appt.start_dt, tz_name)
-                price_label = format_price(
-                    appt.price_override if appt.price_override is not None else appt.service.price
-                )
-                client_label = appt.client.full_name or (
-                    f"@{appt.client.username}" if appt.client.username else str(appt.client.tg_id)
-                )
-                service_label = appointment_services_label(appt)
-                text = (
-                    "✅ Визит завершён.\n"
-                    "Подтверди финальную стоимость для учёта:\n"
-                    f"{date_label} {time_label}\n"
-                    f"Услуга: {service_label}\n"
-                    f"Клиент: {client_label}\n"
-                    f"Цена: {price_label}"
-                )
-                for admin_id in admin_ids:
-                    try:
-                        await context.bot.send_message(
-                            chat_id=admin_id,
-                            text=text,
-                            reply_markup=admin_visit_confirm_kb(appt.id),
-                        )
-                    except Exception:
-                        continue
-
-            if appt.client and appt.client.tg_id:
-                try:
-                    for part in AFTERCARE_RECOMMENDATIONS_PARTS:
-                        await context.bot.send_message(
-                            chat_id=appt.client.tg_id,
-                            text=part,
-                        )
-                except Exception:
-                    pass
+        appts_aftercare = (await session.execute(q_aftercare)).scalars().all()
+        await session.commit()
+    if not appts_aftercare:
+        return
 
-            await session.execute(
-                update(Appointment)
-                .where(Appointment.id == appt.id)
-                .values(status=AppointmentStatus.Completed, updated_at=_utcnow())
+    admin_ids = _admin_ids(cfg)
+    aftercare_from = now - AFTERCARE_WINDOW
+
+    prompts: list[dict] = []
+    for appt in appts_aftercare:
+        date_label, time_label = _fmt_date(appt.start_dt, tz)
+        price_label = format_price(
+            appt.price_override if appt.price_override is not None else appt.service.price
+        )
+        client_label = client_label_for(appt.client.full_name, appt.client.username, appt.client.tg_id)
+        prompts.append(dict(
+            text=(
+                "✅ Визит завершён.\n"
+                "Подтверди финальную стоимость для учёта:\n"
+                f"{date_label} {time_label}\n"
+                f"Услуга: {appointment_services_label(appt)}\n"
+                f"Клиент: {client_label}\n"
+                f"Цена: {price_label}"
+            ),
+            reply_markup=admin_visit_confirm_kb(appt.id),
+        ))
+
+    # Чаты разные — параллельно, внутри одного чата — по очереди (см. _send_to_chat).
+    if admin_ids:
+        per_admin = await asyncio.gather(*(
+            _send_to_chat(context.bot, admin_id, prompts) for admin_id in admin_ids
+        ))
+        # визит завершаем, если запрос цены дошёл хотя бы до одного админа или все
+        # админские чаты недоступны насовсем; при временных ошибках он остаётся
+        # Booked и запрос повторится на следующем тике (не дольше VISIT_COMPLETE_LOOKBACK)
+        done = [
+            appt for i, appt in enumerate(appts_aftercare)
+            if any(res[i] for res in per_admin) or all(res[i] is None for res in per_admin)
+        ]
+    else:
+        done = list(appts_aftercare)
+    if not done:
+        return
+
+    # рекомендации — только по свежим визитам и только по завершаемым сейчас,
+    # чтобы при повторе запроса цены клиент не получил их второй раз
+    client_messages: dict[int, list[dict]] = {}
+    for appt in done:
+        if appt.client.tg_id and appt.end_dt > aftercare_from:
+            client_messages.setdefault(appt.client.tg_id, []).extend(
+                dict(text=message) for message in AFTERCARE_MESSAGES
             )
+    await asyncio.gather(*(
+        _send_to_chat(context.bot, chat_id, messages, stop_on_error=True)
+        for chat_id, messages in client_messages.items()
+    ))
 
+    async with session_factory() as session:
+        await session.execute(
+            update(Appointment)
+            .where(Appointment.id.in_([appt.id for appt in done]))
+            .values(status=AppointmentStatus.Completed, updated_at=now)
+        )
         await session.commit()
 
 
@@ -317,54 +455,57 @@ async def send_daily_admin_schedule(context: ContextTypes.DEFAULT_TYPE) -> None:
     if not admin_ids:
         return
 
-    tz_name = app.bot_data.get("tz", "Europe/Moscow")
-    try:
-        import pytz
-        tz = pytz.timezone(tz_name)
-    except Exception:
-        tz = timezone.utc
+    tz = _get_tz(app.bot_data.get("tz", "Europe/Moscow"))
 
     now_local = datetime.now(tz=tz)
     day = now_local.date()
-    start_local = datetime.combine(day, dt_time.min)
-    if hasattr(tz, "localize"):
-        start_local = tz.localize(start_local)
-    else:
-        start_local = start_local.replace(tzinfo=tz)
+    start_local = datetime.combine(day, dt_time.min, tzinfo=tz)
     end_local = start_local + timedelta(days=1)
     start_utc = start_local.astimezone(timezone.utc)
     end_utc = end_local.astimezone(timezone.utc)
 
     async with session_factory() as session:
+        # только нужные колонки одним JOIN — без ORM-объектов и selectin-запросов
         q = (
-            select(Appointment)
-            .options(selectinload(Appointment.client), selectinload(Appointment.service))
+            select(
+                Appointment.start_dt,
+                Appointment.end_dt,
+                Appointment.admin_comment,
+                Appointment.price_override,
+                Service.name,
+                Service.price,
+                User.full_name,
+                User.username,
+                User.tg_id,
+                User.phone,
+            )
+            .join(Service, Appointment.service_id == Service.id)
+            .join(User, Appointment.client_user_id == User.id)
             .where(Appointment.status == AppointmentStatus.Booked)
             .where(Appointment.start_dt >= start_utc)
             .where(Appointment.start_dt < end_utc)
             .order_by(Appointment.start_dt.asc())
         )
-        res = await session.execute(q)
-        appts = list(res.scalars().all())
+        rows = (await session.execute(q)).all()
 
-    if not appts:
+    if not rows:
         text = "На сегодня записей нет."
     else:
-        day_label = f"{day.strftime('%d.%m.%Y')} ({weekday_ru_full(now_local)})"
+        day_label = f"{_date_label(day)} ({WEEKDAY_RU_FULL[day.weekday()]})"
         lines = [f"📅 Записи на сегодня: {day_label}"]
-        for appt in appts:
-            start_t = appt.start_dt.astimezone(tz).strftime("%H:%M")
-            end_t = appt.end_dt.astimezone(tz).strftime("%H:%M")
-            client = appt.client.full_name or (
-                f"@{appt.client.username}" if appt.client.username else str(appt.client.tg_id)
-            )
-            phone = appt.client.phone or "—"
-            price = format_price(
-                appt.price_override if appt.price_override is not None else appt.service.price
-            )
-            service_label = appointment_services_label(appt)
-            lines.append(
-                f"• {start_t}–{end_t} | {service_label} | {price} | {client} | {phone}"
+        append = lines.append
+        # порядок колонок — как в select выше; распаковка вместо row.<attr> в цикле
+        for (
+            start_dt, end_dt, admin_comment, price_override, service_name, service_price,
+            full_name, username, tg_id, phone,
+        ) in rows:
+            s_local = start_dt.astimezone(tz)
+            e_local = end_dt.astimezone(tz)
+            price = format_price(price_override if price_override is not None else service_price)
+            append(
+                f"• {s_local.hour:02d}:{s_local.minute:02d}–{e_local.hour:02d}:{e_local.minute:02d}"
+                f" | {services_label_for(admin_comment, service_name)} | {price}"
+                f" | {client_label_for(full_name, username, tg_id)} | {phone or '—'}"
             )
         text = "\n".join(lines)
 
@@ -380,20 +521,15 @@ async def send_daily_admin_earnings_report(context: ContextTypes.DEFAULT_TYPE) -
     Ежедневный отчёт мастеру о заработке за сегодня (подтверждённые записи).
     """
     app = context.application
-    tz_name = app.bot_data.get("tz", "Europe/Moscow")
-    try:
-        import pytz
-        tz = pytz.timezone(tz_name)
-    except Exception:
-        tz = timezone.utc
+    tz = _get_tz(app.bot_data.get("tz", "Europe/Moscow"))
 
     now_local = datetime.now(tz=tz)
     day = now_local.date()
-    start_local = _localize(datetime.combine(day, dt_time.min), tz)
+    start_local = datetime.combine(day, dt_time.min, tzinfo=tz)
     end_local = start_local + timedelta(days=1)
     start_utc = start_local.astimezone(timezone.utc)
     end_utc = end_local.astimezone(timezone.utc)
-    day_label = day.strftime('%d.%m.%Y')
+    day_label = _date_label(day)
     title = f"💰 Отчёт за сегодня ({day_label})"
     await _send_earnings_report(
         context,
@@ -410,12 +546,7 @@ async def send_weekly_admin_earnings_report(context: ContextTypes.DEFAULT_TYPE)
     Отправляется в конце недели (воскресенье).
     """
     app = context.application
-    tz_name = app.bot_data.get("tz", "Europe/Moscow")
-    try:
-        import pytz
-        tz = pytz.timezone(tz_name)
-    except Exception:
-        tz = timezone.utc
+    tz = _get_tz(app.bot_data.get("tz", "Europe/Moscow"))
 
     now_local = datetime.now(tz=tz)
     if now_local.weekday() != 6:
@@ -423,11 +554,11 @@ async def send_weekly_admin_earnings_report(context: ContextTypes.DEFAULT_TYPE)
 
     day = now_local.date()
     week_start = day - timedelta(days=day.weekday())
-    start_local = _localize(datetime.combine(week_start, dt_time.min), tz)
+    start_local = datetime.combine(week_start, dt_time.min, tzinfo=tz)
     end_local = start_local + timedelta(days=7)
     start_utc = start_local.astimezone(timezone.utc)
     end_utc = end_local.astimezone(timezone.utc)
-    week_label = f"{week_start.strftime('%d.%m.%Y')}–{day.strftime('%d.%m.%Y')}"
+    week_label = f"{_date_label(week_start)}–{_date_label(day)}"
     title = f"💰 Отчёт за неделю ({week_label})"
     await _send_earnings_report(
         context,
@@ -444,12 +575,7 @@ async def send_monthly_admin_earnings_report(context: ContextTypes.DEFAULT_TYPE)
     Отправляется в последний день месяца.
     """
     app = context.application
-    tz_name = app.bot_data.get("tz", "Europe/Moscow")
-    try:
-        import pytz
-        tz = pytz.timezone(tz_name)
-    except Exception:
-        tz = timezone.utc
+    tz = _get_tz(app.bot_data.get("tz", "Europe/Moscow"))
 
     now_local = datetime.now(tz=tz)
     day = now_local.date()
@@ -458,15 +584,15 @@ async def send_monthly_admin_earnings_report(context: ContextTypes.DEFAULT_TYPE)
         return
 
     month_start = day.replace(day=1)
-    start_local = _localize(datetime.combine(month_start, dt_time.min), tz)
+    start_local = datetime.combine(month_start, dt_time.min, tzinfo=tz)
     if day.month == 12:
         next_month = datetime(day.year + 1, 1, 1).date()
     else:
         next_month = datetime(day.year, day.month + 1, 1).date()
-    end_local = _localize(datetime.combine(next_month, dt_time.min), tz)
+    end_local = datetime.combine(next_month, dt_time.min, tzinfo=tz)
     start_utc = start_local.astimezone(timezone.utc)
     end_utc = end_local.astimezone(timezone.utc)
-    month_label = month_start.strftime('%m.%Y')
+    month_label = f"{month_start.month:02d}.{month_start.year}"
     title = f"💰 Отчёт за месяц ({month_label})"
     await _send_earnings_report(
         context,
@@ -1,75 +1,102 @@
-from datetime import datetime
-import pytz
+import logging
+from datetime import datetime, timezone
 
-from sqlalchemy import select, and_
+from sqlalchemy import update, text, and_, bindparam, BigInteger
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from app.models import Appointment, AppointmentStatus
-from app.utils import appointment_services_label
+from app.logic import mark_slots_dirty, status_is
+from app.models import Appointment, AppointmentStatus, Service, User
+from app.reminders import send_booking_reminders, complete_finished_visits
+from app.utils import services_label_for
 
+logger = logging.getLogger(__name__)
 
-async def tick(application):
-    """
-    Автоматически сжигает истёкшие HOLD-заявки
-    и уведомляет клиента ОДИН РАЗ.
-    """
-
-    session_factory = application.bot_data["session_factory"]
-    now_utc = datetime.now(tz=pytz.UTC)
+# Ключ advisory-lock минутного джоба: при нескольких инстансах бота тик
+# выполняет только тот, кто успел взять замок, остальные пропускают минуту.
+TICK_LOCK_KEY = 0x45504C5449434B  # "EPLTICK"
 
-    # сюда собираем уведомления ПОКА сессия жива
-    notifications: list[tuple[int, str]] = []
+_TRY_TICK_LOCK_SQL = text("SELECT pg_try_advisory_xact_lock(:k)").bindparams(
+    bindparam("k", type_=BigInteger),
+)
 
-    async with session_factory() as s:  # type: AsyncSession
-        # 1️⃣ Берём ТОЛЬКО истёкшие HOLD
-        res = await s.execute(
-            select(Appointment)
-            .options(
-                selectinload(Appointment.client),
-                selectinload(Appointment.service),
-            )
-            .where(
-                and_(
-                    Appointment.status == AppointmentStatus.Hold,
-                    Appointment.hold_expires_at.is_not(None),
-                    Appointment.hold_expires_at <= now_utc,
-                )
-            )
+# Сжигание HOLD одним UPDATE ... FROM ... RETURNING: статус меняется в БД целиком,
+# а наружу возвращается ровно то, что нужно для уведомления клиента.
+_EXPIRE_HOLDS_STMT = (
+    update(Appointment)
+    .where(
+        and_(
+            Appointment.client_user_id == User.id,
+            Appointment.service_id == Service.id,
+            status_is(AppointmentStatus.Hold),
+            Appointment.hold_expires_at.is_not(None),
+            Appointment.hold_expires_at <= bindparam("now_utc"),
         )
+    )
+    .values(status=AppointmentStatus.Rejected, updated_at=bindparam("now_utc"))
+    .returning(User.tg_id, Appointment.start_dt, Appointment.admin_comment, Service.name)
+    .execution_options(synchronize_session=False)
+)
 
-        expired = res.scalars().all()
-        if not expired:
-            return  # Нечего сжигать → не шлём сообщений
-
-        # 2️⃣ Обновляем статус + готовим сообщения
-        for appt in expired:
-            appt.status = AppointmentStatus.Rejected
-            appt.updated_at = now_utc
 
-            chat_id = appt.client.tg_id
-            service_name = appointment_services_label(appt)
-            dt_txt = appt.start_dt.astimezone(pytz.UTC).strftime("%d.%m %H:%M")
+async def expire_holds(s: AsyncSession, now_utc: datetime) -> list[tuple[int, str]]:
+    """
+    Сжигает истёкшие HOLD-заявки в сессии s и возвращает уведомления клиентам.
+    Commit — на вызывающем, уведомления отправлять только после него.
+    """
+    rows = (await s.execute(_EXPIRE_HOLDS_STMT, {"now_utc": now_utc})).all()
+    if rows:
+        # bulk UPDATE идёт мимо flush — освободившиеся слоты сбросят кэш после commit
+        mark_slots_dirty(s)
 
-            notifications.append(
+    # сюда собираем уведомления ПОКА сессия жива
+    notifications: list[tuple[int, str]] = []
+    for chat_id, start_dt, admin_comment, service_name in rows:
+        dt_txt = start_dt.astimezone(timezone.utc).strftime("%d.%m %H:%M")
+        notifications.append(
+            (
+                chat_id,
                 (
-                    chat_id,
-                    (
-                        "⏳ Заявка не была подтверждена мастером и автоматически отменена.\n\n"
-                        f"Услуга: {service_name}\n"
-                        f"Дата/время: {dt_txt}\n\n"
-                        "Вы можете выбрать другое время в меню «Записаться»."
-                    ),
-                )
+                    "⏳ Заявка не была подтверждена мастером и автоматически отменена.\n\n"
+                    f"Услуга: {services_label_for(admin_comment, service_name)}\n"
+                    f"Дата/время: {dt_txt}\n\n"
+                    "Вы можете выбрать другое время в меню «Записаться»."
+                ),
             )
+        )
+    return notifications
 
-        # 3️⃣ Фиксируем изменения В БАЗЕ
-        await s.commit()
 
-    # 4️⃣ Отправляем уведомления ПОСЛЕ commit (важно!)
-    for chat_id, text in notifications:
+async def _notify_expired(bot, notifications: list[tuple[int, str]]) -> None:
+    for chat_id, msg in notifications:
         try:
-            await application.bot.send_message(chat_id=chat_id, text=text)
+            await bot.send_message(chat_id=chat_id, text=msg)
         except Exception as e:
             # логируем, но не валим тик
-            print("TICK NOTIFY ERROR:", e)
+            logger.warning("Failed to notify about expired hold: %s", e)
+
+
+async def periodic_tick(context) -> None:
+    """
+    Единый минутный джоб: сжигание HOLD, напоминания и завершение визитов.
+    Каждая фаза работает в своей короткой сессии, сообщения уходят после её
+    commit — ни блокировки строк, ни соединение фазы не держатся, пока идёт сеть,
+    а ошибка в поздней фазе не откатывает уже сожжённые заявки. Advisory-lock
+    тика живёт в отдельной сессии до конца джоба, чтобы второй инстанс не слал
+    те же напоминания; длительность тика ограничена порцией AFTERCARE_BATCH.
+    """
+    application = context.application
+    session_factory = application.bot_data["session_factory"]
+    now_utc = datetime.now(tz=timezone.utc)
+
+    async with session_factory() as lock_s:  # type: AsyncSession
+        if not await lock_s.scalar(_TRY_TICK_LOCK_SQL, {"k": TICK_LOCK_KEY}):
+            return  # тик уже идёт в другом процессе
+
+        async with session_factory() as s:  # type: AsyncSession
+            notifications = await expire_holds(s, now_utc)
+            await s.commit()
+        # уведомления о сгоревших заявках — ПОСЛЕ commit
+        await _notify_expired(application.bot, notifications)
+
+        await send_booking_reminders(context, session_factory, now_utc)
+        await complete_finished_visits(context, session_factory, now_utc)
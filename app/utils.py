@@ -1,25 +1,43 @@
 from __future__ import annotations
 
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
 
 
 def format_price(value: object) -> str:
     if value is None:
         return ""
+    return _fmt_price(str(value))
+
+
+@lru_cache(maxsize=512)
+def _fmt_price(raw: str) -> str:
+    # цены берутся из короткого прайса — повторные значения отдаются из кэша
     try:
-        normalized = f"{Decimal(str(value)):.2f}"
+        normalized = f"{Decimal(raw):.2f}"
     except (InvalidOperation, ValueError):
-        return str(value)
+        return raw
     return normalized.rstrip("0").rstrip(".")
 
 
-def appointment_services_label(appt) -> str:
-    comment = (getattr(appt, "admin_comment", None) or "").strip()
+def services_label_for(admin_comment: str | None, service_name: str | None) -> str:
+    comment = (admin_comment or "").strip()
     if comment.lower().startswith("услуги:"):
         label = comment.split(":", 1)[1].strip()
         if label:
             return label
-    service = getattr(appt, "service", None)
-    if service and getattr(service, "name", None):
-        return service.name
+    if service_name:
+        return service_name
     return "Услуга"
+
+
+def client_label_for(full_name: str | None, username: str | None, tg_id: int) -> str:
+    return full_name or (username and f"@{username}") or str(tg_id)
+
+
+def appointment_services_label(appt) -> str:
+    service = getattr(appt, "service", None)
+    return services_label_for(
+        getattr(appt, "admin_comment", None),
+        getattr(service, "name", None) if service else None,
+    )